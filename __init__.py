@@ -8,6 +8,11 @@ and returns the results.
 Components:
 - main.py: FastAPI application with /query endpoint
 - sql_query_generator.py: Watsonx.ai powered SQL generation
+- query_router.py: Template SQL for common queries, bypassing Watsonx
+- semantic_cache.py: Embedding-based cache of generated SQL
+- request_coalescer.py: Batches concurrent generation requests into one model call
+- token_manager.py: Shares and proactively refreshes the IAM bearer token
+- sql_validator.py: Checks generated SQL against the prompt schema
 - db_client.py: DB2 database client
 - config.py: Configuration management
 """
@@ -17,8 +22,8 @@ __author__ = "IBM Skills Profile Team"
 
 from sql_query_generator import SQLQueryGenerator
 from db_client import DB2Client
-from config import Config
+from config import CONFIG
 
-__all__ = ["SQLQueryGenerator", "DB2Client", "Config"]
+__all__ = ["SQLQueryGenerator", "DB2Client", "CONFIG"]
 
 # Made with Bob
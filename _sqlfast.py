@@ -0,0 +1,65 @@
+"""
+Hot-path helpers for SQL cleaning and row building.
+
+This module is fully type-annotated so it can be compiled ahead of time
+with mypyc (``mypyc _sqlfast.py``). The compiled extension is picked up
+automatically in place of this file; without it the same code runs as
+plain Python.
+"""
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+# Extracts the SQL from a ```sql fence, or from the first line starting with
+# SELECT (optionally after "SQL:") up to ";", the PARAMS line or the end.
+# Blank lines do not end it, since the model may split clauses with them.
+# Anchoring to a line start keeps "select" in prose from matching.
+_SQL_RE = re.compile(
+    r"```sql\s*(?:sql:\s*)?(.*?)(?:^\s*PARAMS:[^\n]*\s*)?```"
+    r"|^[ \t]*(?:sql:[ \t]*)?(SELECT\b.+?)(?:;|\n\s*PARAMS:|\Z)",
+    re.IGNORECASE | re.DOTALL | re.MULTILINE,
+)
+# Openings of prose lines the model sometimes wraps around the SQL
+# ("Here is ...", "Note: ..."), matched case-insensitively
+PROSE_PREFIXES: Tuple[str, ...] = ("here", "the", "this", "note:", "explanation:")
+# Whole prose lines, newline included, starting with one of PROSE_PREFIXES;
+# bare words must end at a word boundary so "theme" or "therefore" inside
+# SQL-ish text is kept
+_PROSE_RE = re.compile(
+    r"^[ \t]*(?:"
+    + "|".join(re.escape(p) + (r"\b" if p[-1].isalnum() else "") for p in PROSE_PREFIXES)
+    + r").*(?:\n|$)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_WS_RE = re.compile(r"\s+")
+
+# True when running as the mypyc-compiled extension
+COMPILED: bool = not __file__.endswith(".py")
+
+
+def clean_sql_query(generated_text: str) -> str:
+    """Extract and clean SQL returned by Watsonx."""
+    # Drop prose lines first, so neither a preamble nor notes inside the SQL survive
+    match = _SQL_RE.search(_PROSE_RE.sub("", generated_text))
+    if match is None:
+        raise ValueError("Generated output is not a valid SELECT statement")
+
+    body = match.group(1)
+    sql_query: str = body if body is not None else match.group(2)
+    sql_query = _WS_RE.sub(" ", sql_query.replace(";", " ")).strip()
+
+    if sql_query[:6].upper() != "SELECT":
+        raise ValueError("Generated output is not a valid SELECT statement")
+
+    return sql_query
+
+
+def rows_to_dicts(
+    fetch: Callable[[Any], Any], stmt: Any, cols: Tuple[str, ...]
+) -> List[Dict[str, Any]]:
+    """Fetch every remaining row of stmt and zip it with the column names."""
+    results: List[Dict[str, Any]] = []
+    row = fetch(stmt)
+    while row:
+        results.append(dict(zip(cols, row)))
+        row = fetch(stmt)
+    return results
@@ -1,13 +1,28 @@
 import ibm_db
 import os
-import json
+import functools
+import logging
+import orjson
 from dotenv import load_dotenv
-
-import json
 from datetime import date, datetime
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoder_for(obj_type):
+    """Resolve the JSON fallback encoder once per type."""
+    if issubclass(obj_type, (datetime, date)):
+        return obj_type.isoformat
+    return str  # fallback for other types (Decimal, ...)
+
+
+def serialize_json(obj):
+    """Fallback for values orjson cannot serialize natively."""
+    return _encoder_for(type(obj))(obj)
+
 
 class DB2Client:
     def __init__(self):
@@ -26,7 +41,6 @@ class DB2Client:
         self.port = os.getenv("DB2_PORT")
         self.database = os.getenv("DB2_DATABASE")
         self.conn = None
-        print(self.hostname)
         if not all([self.username, self.password, self.hostname, self.port, self.database]):
             raise ValueError("Please set all required environment variables: DB2_USERNAME, DB2_PASSWORD, DB2_HOSTNAME, DB2_PORT, DB2_DATABASE")
 
@@ -45,7 +59,7 @@ class DB2Client:
                 f"SECURITY=;"  # SSL ON, no cert verification
             )
             self.conn = ibm_db.connect(connection_string, "", "")
-            print("✅ Connected successfully.")
+            logger.info(f"Connected successfully to {self.hostname}")
         except Exception as e:
             raise ConnectionError(f"Failed to connect to DB2: {e}")
 
@@ -55,12 +69,11 @@ class DB2Client:
         """
         if self.conn is None:
             raise ConnectionError("Connection not established. Call connect() first.")
-        print(query)
+        logger.debug("Executing query: %s", query)
         try:
             stmt = ibm_db.exec_immediate(self.conn, query)
             results = []
             row = ibm_db.fetch_assoc(stmt)
-            print("row:",row)
             while row:
                 results.append(row)
                 row = ibm_db.fetch_assoc(stmt)
@@ -68,19 +81,6 @@ class DB2Client:
         except Exception as e:
             raise RuntimeError(f"Query execution failed: {e}")
     
-    def execute_non_query(self, query: str):
-        """
-        Executes an INSERT, UPDATE, or DELETE statement.
-        Does not return rows.
-        """
-        if self.conn is None:
-            raise ConnectionError("Connection not established. Call connect() first.")
-
-        try:
-            stmt = ibm_db.exec_immediate(self.conn, query)
-            return True  # success flag
-        except Exception as e:
-            raise RuntimeError(f"Non-query execution failed: {e}")
     def execute_non_query(self, query: str):
         """
         Executes an INSERT, UPDATE, or DELETE statement.
@@ -105,19 +105,10 @@ class DB2Client:
 
  
 
-    def serialize_json(obj):
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()  # Convert to string
-        return str(obj)  
-
     def save_results_to_json(self, results, filename="query_results.json"):
-        def serialize_json(obj):
-            if isinstance(obj, (datetime, date)):
-                return obj.isoformat()
-            return str(obj)  # fallback for other types
-        with open(filename, "w") as f:
-            json.dump(results, f, indent=4, default=serialize_json)
-        print(f"✅ Results saved to {filename}")
+        with open(filename, "wb") as f:
+            f.write(orjson.dumps(results, default=serialize_json, option=orjson.OPT_INDENT_2))
+        logger.info(f"Results saved to {filename}")
 
     
     
@@ -129,7 +120,7 @@ class DB2Client:
         """
         if self.conn:
             ibm_db.close(self.conn)
-            print("✅ Connection closed.")
+            logger.info("Connection closed")
 
 
 # -------------------------
@@ -3,43 +3,45 @@ Configuration file for Chat Assist Service
 Loads environment variables for database and Watsonx.ai connections
 """
 import os
+import logging
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-class Config:
-    """Configuration class for Chat Assist service"""
+
+@dataclass(frozen=True, slots=True)
+class _Config:
+    """Configuration for Chat Assist service, parsed once at import"""
     
     # Database Configuration
-    DB2_USERNAME = os.getenv("DB2_USERNAME")
-    DB2_PASSWORD = os.getenv("DB2_PASSWORD")
-    DB2_HOSTNAME = os.getenv("DB2_HOSTNAME")
-    DB2_PORT = os.getenv("DB2_PORT", "30756")
-    DB2_DATABASE = os.getenv("DB2_DATABASE", "bludb")
-    DB2_SCHEMA = os.getenv("DB2_SCHEMA", "")
+    db2_username: str | None
+    db2_password: str | None
+    db2_hostname: str | None
+    db2_port: str
+    db2_database: str
+    db2_schema: str
+    db_concurrency: int
     
     # Watsonx.ai Configuration
-    WATSONX_URL = os.getenv("WATSONX_URL")
-    WATSONX_API_KEY = os.getenv("WATSONX_API_KEY")
-    WATSONX_PROJECT_ID = os.getenv("WATSONX_PROJECT_ID")
-    WATSONX_MODEL_ID = os.getenv("WATSONX_MODEL_ID")
-    # WATSONX_URL = os.getenv("WATSONX_URL", "https://au-syd.ml.cloud.ibm.com")
-    # WATSONX_API_KEY = os.getenv("WATSONX_API_KEY", "vMFIDIhzXgPKtX7G_-hNqVrt0BdXLXrz4pACbkVaww_C")
-    # WATSONX_PROJECT_ID = os.getenv("WATSONX_PROJECT_ID", "2b41d077-7711-4655-b379-1b40cfaf4674")
-    # WATSONX_MODEL_ID = os.getenv("WATSONX_MODEL_ID", "ibm/llama-3-3-70b-instruct")
+    watsonx_url: str | None
+    watsonx_api_key: str | None
+    watsonx_project_id: str | None
+    watsonx_model_id: str | None
     
     # API Configuration
-    API_HOST = os.getenv("API_HOST", "0.0.0.0")
-    API_PORT = int(os.getenv("API_PORT", "8085"))
-    API_RELOAD = os.getenv("API_RELOAD", "True").lower() == "true"
+    api_host: str
+    api_port: int
+    api_reload: bool
+    api_workers: int
     
     # CORS Configuration
-    CORS_ORIGINS = ["*"]  # Configure as needed for production
+    cors_origins: tuple[str, ...]
     
-    @classmethod
-    def validate(cls):
+    def validate(self):
         """Validate that all required configuration is present"""
         required_db_vars = [
             "DB2_USERNAME",
@@ -59,11 +61,11 @@ class Config:
         missing_vars = []
         
         for var in required_db_vars:
-            if not getattr(cls, var):
+            if not getattr(self, var.lower()):
                 missing_vars.append(var)
         
         for var in required_watsonx_vars:
-            if not getattr(cls, var):
+            if not getattr(self, var.lower()):
                 missing_vars.append(var)
         
         if missing_vars:
@@ -74,42 +76,62 @@ class Config:
         
         return True
     
-    @classmethod
-    def get_db_connection_string(cls):
+    def get_db_connection_string(self):
         """Get DB2 connection string"""
         return (
-            f"DATABASE={cls.DB2_DATABASE};"
-            f"HOSTNAME={cls.DB2_HOSTNAME};"
-            f"PORT={cls.DB2_PORT};"
+            f"DATABASE={self.db2_database};"
+            f"HOSTNAME={self.db2_hostname};"
+            f"PORT={self.db2_port};"
             f"PROTOCOL=TCPIP;"
-            f"UID={cls.DB2_USERNAME};"
-            f"PWD={cls.DB2_PASSWORD};"
+            f"UID={self.db2_username};"
+            f"PWD={self.db2_password};"
             f"SECURITY=SSL;"
         )
     
-    @classmethod
-    def print_config(cls):
-        """Print configuration (without sensitive data)"""
-        print("=" * 60)
-        print("Chat Assist Service Configuration")
-        print("=" * 60)
-        print(f"Database: {cls.DB2_DATABASE}")
-        print(f"DB Host: {cls.DB2_HOSTNAME}")
-        print(f"DB Port: {cls.DB2_PORT}")
-        print(f"DB Schema: {cls.DB2_SCHEMA or 'Not specified'}")
-        print(f"Watsonx URL: {cls.WATSONX_URL}")
-        print(f"Watsonx Model: {cls.WATSONX_MODEL_ID}")
-        print(f"API Host: {cls.API_HOST}")
-        print(f"API Port: {cls.API_PORT}")
-        print("=" * 60)
+    def print_config(self):
+        """Log configuration (without sensitive data)"""
+        logger.info("Chat Assist Service Configuration")
+        logger.info(f"Database: {self.db2_database}")
+        logger.info(f"DB Host: {self.db2_hostname}")
+        logger.info(f"DB Port: {self.db2_port}")
+        logger.info(f"DB Schema: {self.db2_schema or 'Not specified'}")
+        logger.info(f"Watsonx URL: {self.watsonx_url}")
+        logger.info(f"Watsonx Model: {self.watsonx_model_id}")
+        logger.info(f"API Host: {self.api_host}")
+        logger.info(f"API Port: {self.api_port}")
+        logger.info(f"API Workers: {self.api_workers}")
+
+
+CONFIG = _Config(
+    db2_username=os.getenv("DB2_USERNAME"),
+    db2_password=os.getenv("DB2_PASSWORD"),
+    db2_hostname=os.getenv("DB2_HOSTNAME"),
+    db2_port=os.getenv("DB2_PORT", "30756"),
+    db2_database=os.getenv("DB2_DATABASE", "bludb"),
+    db2_schema=os.getenv("DB2_SCHEMA", ""),
+    db_concurrency=int(os.getenv("DB_CONCURRENCY", "15")),
+    watsonx_url=os.getenv("WATSONX_URL"),
+    watsonx_api_key=os.getenv("WATSONX_API_KEY"),
+    watsonx_project_id=os.getenv("WATSONX_PROJECT_ID"),
+    watsonx_model_id=os.getenv("WATSONX_MODEL_ID"),
+    # WATSONX_URL = os.getenv("WATSONX_URL", "https://au-syd.ml.cloud.ibm.com")
+    # WATSONX_API_KEY = os.getenv("WATSONX_API_KEY", "vMFIDIhzXgPKtX7G_-hNqVrt0BdXLXrz4pACbkVaww_C")
+    # WATSONX_PROJECT_ID = os.getenv("WATSONX_PROJECT_ID", "2b41d077-7711-4655-b379-1b40cfaf4674")
+    # WATSONX_MODEL_ID = os.getenv("WATSONX_MODEL_ID", "ibm/llama-3-3-70b-instruct")
+    api_host=os.getenv("API_HOST", "0.0.0.0"),
+    api_port=int(os.getenv("API_PORT", "8085")),
+    api_reload=os.getenv("API_RELOAD", "True").lower() == "true",
+    api_workers=int(os.getenv("API_WORKERS", "4")),
+    cors_origins=("*",),  # Configure as needed for production
+)
 
 
 # Validate configuration on import
 try:
-    Config.validate()
-    print("✅ Configuration validated successfully")
+    CONFIG.validate()
+    logger.info("Configuration validated successfully")
 except ValueError as e:
-    print(f"❌ Configuration error: {e}")
+    logger.error(f"Configuration error: {e}")
     raise
 
 # Made with Bob
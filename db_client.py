@@ -1,13 +1,51 @@
 import ibm_db
 import os
-import json
+import functools
+import logging
+import orjson
+import threading
+import time
+import atexit
+from typing import Any, Sequence
+from cachetools import LRUCache
 from dotenv import load_dotenv
-
-import json
 from datetime import date, datetime
 
+from _sqlfast import rows_to_dicts
+
+try:
+    # Optional bulk path: reads result sets straight into Arrow columnar buffers
+    import arrow_odbc
+    import pyarrow
+except ImportError:
+    arrow_odbc = None
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoder_for(obj_type):
+    """Resolve the JSON fallback encoder once per type."""
+    if issubclass(obj_type, (datetime, date)):
+        return obj_type.isoformat
+    return str  # fallback for other types (Decimal, ...)
+
+
+def serialize_json(obj):
+    """Fallback for values orjson cannot serialize natively."""
+    return _encoder_for(type(obj))(obj)
+
+# Number of DB threads, each owning one DB2 connection (sizes the API executor in main.py)
+POOL_SIZE = int(os.getenv("DB2_POOL_SIZE", "16"))
+POOL_IDLE_TIMEOUT = float(os.getenv("DB2_POOL_IDLE_TIMEOUT", "300"))
+# Prepared statements kept per connection
+STMT_CACHE_SIZE = int(os.getenv("DB2_STMT_CACHE_SIZE", "128"))
+# ODBC driver name used by the arrow-odbc path (as registered in odbcinst.ini)
+ODBC_DRIVER = os.getenv("DB2_ODBC_DRIVER", "IBM DB2 ODBC DRIVER")
+ARROW_MAX_BYTES_PER_BATCH = 64 * 1024 * 1024
+
 
 class DB2Client:
     def __init__(self):
@@ -20,6 +58,10 @@ class DB2Client:
             DB2_PORT
             DB2_DATABASE
             DB2_SCHEMA (optional, for prefixing table names)
+            DB2_POOL_SIZE (optional, number of DB threads/connections, default 16)
+            DB2_POOL_IDLE_TIMEOUT (optional, seconds before an idle connection is re-validated)
+            DB2_STMT_CACHE_SIZE (optional, prepared statements cached per connection)
+            DB2_ODBC_DRIVER (optional, ODBC driver name for the arrow-odbc path)
         """
         self.username = os.getenv("DB2_USERNAME")
         self.password = os.getenv("DB2_PASSWORD")
@@ -27,63 +69,237 @@ class DB2Client:
         self.port = os.getenv("DB2_PORT")
         self.database = os.getenv("DB2_DATABASE")
         self.schema = os.getenv("DB2_SCHEMA", "")  # Optional schema prefix
-        self.conn = None
+        self.pool_size = POOL_SIZE
+        self.idle_timeout = POOL_IDLE_TIMEOUT
+        self._connection_string = None
+        # Each thread owns one connection (and its prepared statements), so
+        # ibm_db handles are never shared and queries take no pool lock.
+        self._tls = threading.local()
+        # Every per-thread connection, so close() can reach them all
+        self._connections: list = []
+        self._connections_lock = threading.Lock()
 
         if not all([self.username, self.password, self.hostname, self.port, self.database]):
             raise ValueError("Please set all required environment variables: DB2_USERNAME, DB2_PASSWORD, DB2_HOSTNAME, DB2_PORT, DB2_DATABASE")
         
-        print(f"DB2 Client initialized for database: {self.database}")
+        logger.info(f"DB2 Client initialized for database: {self.database}")
         if self.schema:
-            print(f"Using schema: {self.schema}")
+            logger.info(f"Using schema: {self.schema}")
 
     def connect(self):
         """
-        Connects to DB2 using SSL without certificate verification.
+        Prepares DB2 connections using SSL without certificate verification.
+        Opens the calling thread's connection right away so bad credentials
+        fail at startup; every other thread connects on its first query.
         """
+        self._connection_string = (
+            f"DATABASE={self.database};"
+            f"HOSTNAME={self.hostname};"
+            f"PORT={self.port};"
+            f"PROTOCOL=TCPIP;"
+            f"UID={self.username};"
+            f"PWD={self.password};"
+            f"SECURITY=SSL;"  # SSL ON, no cert verification
+        )
         try:
-            connection_string = (
-                f"DATABASE={self.database};"
-                f"HOSTNAME={self.hostname};"
-                f"PORT={self.port};"
-                f"PROTOCOL=TCPIP;"
-                f"UID={self.username};"
-                f"PWD={self.password};"
-                f"SECURITY=SSL;"  # SSL ON, no cert verification
-            )
-            self.conn = ibm_db.connect(connection_string, "", "")
-            print("✅ Connected successfully.")
+            self._conn()
+            logger.info(f"Connected successfully (up to {self.pool_size} per-thread connections)")
         except Exception as e:
+            self.close()
             raise ConnectionError(f"Failed to connect to DB2: {e}")
+        atexit.register(self.close)
+
+    def _open_connection(self):
+        """
+        Opens a connection for the current thread and registers it for close().
+        ibm_db.pconnect would hand back the same cached handle for identical
+        credentials on every thread, so each thread gets its own ibm_db.connect handle.
+        """
+        conn = ibm_db.connect(self._connection_string, "", "")
+        with self._connections_lock:
+            self._connections.append(conn)
+        self._tls.stmts = LRUCache(maxsize=STMT_CACHE_SIZE)
+        return conn
+
+    def _conn(self):
+        """
+        Returns the current thread's connection, opening it on first use and
+        re-validating it if it sat idle longer than DB2_POOL_IDLE_TIMEOUT.
+        """
+        if self._connection_string is None:
+            raise ConnectionError("Connection not established. Call connect() first.")
+        tls = self._tls
+        conn = getattr(tls, "conn", None)
+        now = time.monotonic()
+        if conn is None:
+            conn = tls.conn = self._open_connection()
+        elif now - tls.last_used > self.idle_timeout and not ibm_db.active(conn):
+            try:
+                ibm_db.close(conn)
+            except Exception:
+                pass
+            with self._connections_lock:
+                self._connections.remove(conn)
+            tls.conn = None
+            try:
+                conn = tls.conn = self._open_connection()
+            except Exception as e:
+                raise ConnectionError(f"Failed to reconnect to DB2: {e}")
+        tls.last_used = now
+        return conn
+
+    @staticmethod
+    def _columns(stmt):
+        """
+        Returns the result set column names, read once per statement.
+        """
+        return tuple(ibm_db.field_name(stmt, i) for i in range(ibm_db.num_fields(stmt)))
+
+    def _fetch_dicts(self, stmt):
+        """
+        Fetches all rows as dicts, zipping fetch_tuple rows with the column
+        names instead of letting fetch_assoc rebuild the keys for every row.
+        """
+        return rows_to_dicts(ibm_db.fetch_tuple, stmt, self._columns(stmt))
 
     def execute_query(self, query: str):
         """
         Executes a query and returns the result as a list of dicts.
         """
-        if self.conn is None:
-            raise ConnectionError("Connection not established. Call connect() first.")
-        print(query)
+        logger.debug("Executing query: %s", query)
+        conn = self._conn()
         try:
-            stmt = ibm_db.exec_immediate(self.conn, query)
-            results = []
-            row = ibm_db.fetch_assoc(stmt)
-            print("row:",row)
-            while row:
-                results.append(row)
-                row = ibm_db.fetch_assoc(stmt)
-            return results
+            stmt = ibm_db.exec_immediate(conn, query)
+            return self._fetch_dicts(stmt)
         except Exception as e:
             raise RuntimeError(f"Query execution failed: {e}")
     
+    def _prepare(self, conn, sql_template: str):
+        """
+        Returns the prepared statement for sql_template on the current thread's
+        connection, preparing it on first use so repeated query shapes skip
+        DB2 parse/optimize.
+        """
+        stmts = self._tls.stmts
+        stmt = stmts.get(sql_template)
+        if stmt is None:
+            stmt = ibm_db.prepare(conn, sql_template)
+            stmts[sql_template] = stmt
+        return stmt
+
+    def execute_prepared(self, sql_template: str, params: Sequence[Any] = ()):
+        """
+        Executes a query with ? parameter markers and returns the result as a
+        list of dicts. Statements are prepared once per connection and reused.
+        """
+        logger.debug("Executing prepared query: %s", sql_template)
+        conn = self._conn()
+        try:
+            stmt = self._prepare(conn, sql_template)
+            ibm_db.execute(stmt, tuple(params))
+            return self._fetch_dicts(stmt)
+        except Exception as e:
+            raise RuntimeError(f"Query execution failed: {e}")
+
+    def iter_query(self, query: str, params: Sequence[Any] | None = None, batch: int = 1000):
+        """
+        Executes a query and yields the result column-oriented, as
+        {"columns": (...), "rows": [tuple, ...]} batches of at most `batch` rows.
+        An empty result yields a single batch with no rows.
+        When params are given the query is run as a cached prepared statement.
+        The generator uses the connection of the thread that starts it, so it
+        must be consumed entirely on that thread.
+        """
+        logger.debug("Streaming query: %s", query)
+        conn = self._conn()
+        try:
+            if params is None:
+                stmt = ibm_db.exec_immediate(conn, query)
+            else:
+                stmt = self._prepare(conn, query)
+                ibm_db.execute(stmt, tuple(params))
+            cols = self._columns(stmt)
+            rows = []
+            sent = False
+            row = ibm_db.fetch_tuple(stmt)
+            while row:
+                rows.append(row)
+                if len(rows) >= batch:
+                    yield {"columns": cols, "rows": rows}
+                    rows = []
+                    sent = True
+                row = ibm_db.fetch_tuple(stmt)
+            if rows or not sent:
+                yield {"columns": cols, "rows": rows}
+        except Exception as e:
+            raise RuntimeError(f"Query execution failed: {e}")
+
+    def _arrow_reader(self, query: str, params: Sequence[Any] | None):
+        """
+        Runs a query through arrow-odbc and returns its batch reader.
+        arrow-odbc opens its own ODBC connection, outside the ibm_db pool.
+        """
+        if arrow_odbc is None:
+            raise RuntimeError("arrow-odbc is not installed (pip install arrow-odbc)")
+        connection_string = (
+            f"DRIVER={{{ODBC_DRIVER}}};"
+            f"DATABASE={self.database};"
+            f"HOSTNAME={self.hostname};"
+            f"PORT={self.port};"
+            f"PROTOCOL=TCPIP;"
+            f"UID={self.username};"
+            f"PWD={self.password};"
+            f"SECURITY=SSL;"
+        )
+        if params is not None:
+            # ODBC parameters are bound as text; DB2 casts them to the column types
+            params = [None if p is None else str(p) for p in params]
+        return arrow_odbc.read_arrow_batches_from_odbc(
+            query=query,
+            connection_string=connection_string,
+            parameters=params,
+            max_bytes_per_batch=ARROW_MAX_BYTES_PER_BATCH,
+        )
+
+    def iter_arrow_batches(self, query: str, params: Sequence[Any] | None = None):
+        """
+        Executes a query and yields the result as pyarrow.RecordBatch objects,
+        filled column-wise by arrow-odbc instead of one fetch call per row.
+        """
+        logger.debug("Streaming query (arrow): %s", query)
+        try:
+            reader = self._arrow_reader(query, params)
+            if reader is not None:
+                yield from reader
+        except RuntimeError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Query execution failed: {e}")
+
+    def execute_arrow(self, query: str, params: Sequence[Any] | None = None):
+        """
+        Executes a query and returns the result as a pyarrow.Table.
+        Call .to_pylist() on it only where row dicts are actually needed.
+        """
+        logger.debug("Executing query (arrow): %s", query)
+        try:
+            reader = self._arrow_reader(query, params)
+            if reader is None:
+                return pyarrow.table({})
+            return pyarrow.Table.from_batches(list(reader), schema=reader.schema)
+        except RuntimeError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Query execution failed: {e}")
+
     def execute_non_query(self, query: str):
         """
         Executes an INSERT, UPDATE, or DELETE statement.
         Does not return rows.
         """
-        if self.conn is None:
-            raise ConnectionError("Connection not established. Call connect() first.")
-
+        conn = self._conn()
         try:
-            stmt = ibm_db.exec_immediate(self.conn, query)
+            stmt = ibm_db.exec_immediate(conn, query)
             return True  # success flag
         except Exception as e:
             raise RuntimeError(f"Non-query execution failed: {e}")
@@ -98,19 +314,10 @@ class DB2Client:
 
  
 
-    def serialize_json(obj):
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()  # Convert to string
-        return str(obj)  
-
     def save_results_to_json(self, results, filename="query_results.json"):
-        def serialize_json(obj):
-            if isinstance(obj, (datetime, date)):
-                return obj.isoformat()
-            return str(obj)  # fallback for other types
-        with open(filename, "w") as f:
-            json.dump(results, f, indent=4, default=serialize_json)
-        print(f"✅ Results saved to {filename}")
+        with open(filename, "wb") as f:
+            f.write(orjson.dumps(results, default=serialize_json, option=orjson.OPT_INDENT_2))
+        logger.info(f"Results saved to {filename}")
 
     
     
@@ -118,11 +325,21 @@ class DB2Client:
 
     def close(self):
         """
-        Closes the DB2 connection.
+        Closes every per-thread DB2 connection.
         """
-        if self.conn:
-            ibm_db.close(self.conn)
-            print("✅ Connection closed.")
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        closed = 0
+        for conn in connections:
+            try:
+                ibm_db.close(conn)
+                closed += 1
+            except Exception:
+                pass
+        # Drop every thread's stale handle and statement cache
+        self._tls = threading.local()
+        if connections:
+            logger.info(f"DB2 connections closed ({closed} connections)")
 
 
 # # -------------------------
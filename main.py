@@ -1,124 +1,360 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from zstd_asgi import ZstdMiddleware
 from datetime import datetime
 from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import threading
+import time
+import orjson
 import uvicorn
 
 from sql_query_generator import SQLQueryGenerator
-from db_client import DB2Client
-from config import Config
+from db_client import DB2Client, POOL_SIZE, serialize_json
+from config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Caps concurrent DB2 sessions per worker (like max-simultaneous-queries-per-db)
+DB_SEM = asyncio.Semaphore(CONFIG.db_concurrency)
+
+# Batches a /query/stream producer may fetch ahead of the client
+STREAM_PREFETCH = 4
+
+# Response timestamp, formatted at most once per second
+_TS_CACHE = [0, ""]
+
+def _now_iso() -> str:
+    """Return the current local time as an ISO string at second granularity."""
+    now = int(time.time())
+    if now != _TS_CACHE[0]:
+        _TS_CACHE[:] = [now, datetime.fromtimestamp(now).isoformat()]
+    return _TS_CACHE[1]
 
 # ---------------- Pydantic models ----------------
 
+class UserContext(BaseModel):
+    """
+    Identity of the asking user, used to resolve "my ..." questions and to
+    key the SQL cache. Supplied by the calling application; not verified here.
+    """
+    user_id: int
+    talent_id: str | None = None
+    user_name: str | None = None
+    email: str | None = None
+    is_manager: bool = False
+
 class QueryRequest(BaseModel):
     """Request model for natural language query"""
     user_query: str
+    use_arrow: bool = False
+    use_cache: bool = True
+    user_context: UserContext | None = None
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "user_query": "Show all users with API Connect expertise"
             }
         }
+    )
 
 class QueryResponse(BaseModel):
-    """Response model with query results"""
+    """Response model with query results (documents /query; not validated per response)"""
     success: bool
     natural_query: str
     generated_sql: str
+    sql_params: List[Any] = []
     results: List[Dict[str, Any]]
     timestamp: str
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "success": True,
                 "natural_query": "Show all users with API Connect expertise",
-                "generated_sql": "SELECT u.user_id, u.user_name FROM users u...",
+                "generated_sql": "SELECT u.user_id, u.user_name FROM users u... WHERE LOWER(p.product_name) LIKE ?",
+                "sql_params": ["%api connect%"],
                 "results": [{"user_id": 1, "user_name": "John Doe"}],
                 "timestamp": "2026-02-03T16:00:00"
             }
-        }
+        },
+    )
 
-# ---------------- FastAPI app ----------------
+class BatchQueryRequest(BaseModel):
+    """Request model for several independent natural language queries"""
+    queries: List[str] = Field(min_length=1, max_length=20)
+    user_context: UserContext | None = None
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "queries": [
+                    "Show all pending submissions for manager_id 3243",
+                    "Top 5 users with most approved assets"
+                ]
+            }
+        },
+    )
 
-app = FastAPI(
-    title="Chat Assist - Natural Language to SQL",
-    description="Convert natural language queries to SQL and execute against Skills Profile database",
-    version="1.0.0"
-)
+class BatchQueryItem(BaseModel):
+    """Outcome of one query in a batch"""
+    success: bool
+    natural_query: str
+    generated_sql: str | None = None
+    sql_params: List[Any] = []
+    results: List[Dict[str, Any]] = []
+    error: str | None = None
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=Config.CORS_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+class BatchQueryResponse(BaseModel):
+    """Response model for /query/batch, items in request order"""
+    success: bool
+    items: List[BatchQueryItem]
+    timestamp: str
+
+class QueryJSONResponse(ORJSONResponse):
+    """ORJSONResponse that falls back to serialize_json for DB2 values orjson
+    cannot encode natively (Decimal, ...)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=serialize_json, option=orjson.OPT_NON_STR_KEYS)
+
+def _user_context(request: QueryRequest | BatchQueryRequest) -> dict | None:
+    """The request's user context as the plain dict SQLQueryGenerator expects."""
+    return request.user_context.model_dump() if request.user_context else None
+
+# ---------------- Lifespan ----------------
 
 # Initialize services
 sql_generator: SQLQueryGenerator = None  # type: ignore
 db_client: DB2Client = None  # type: ignore
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup"""
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize services on startup and release them on shutdown.
+    Runs once per uvicorn worker, so every worker owns its own DB2 connections."""
     global sql_generator, db_client
     
-    print("\n" + "="*60)
-    print("Starting Chat Assist Service")
-    print("="*60)
+    logger.info("Starting Chat Assist Service")
     
     # Print configuration
-    Config.print_config()
+    CONFIG.print_config()
     
     # Initialize SQL generator
-    print("\n🔧 Initializing SQL Query Generator...")
+    logger.info("Initializing SQL Query Generator...")
     sql_generator = SQLQueryGenerator()
-    print("✅ SQL Query Generator initialized")
+    await sql_generator.connect()
+    logger.info("SQL Query Generator initialized")
     
-    # Initialize and connect DB client
-    print("\n🔧 Connecting to DB2 database...")
+    # Dedicated executor for blocking ibm_db calls; each of its threads owns one DB2 connection
+    app.state.db_pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db2")
+
+    # Initialize DB client; connect() opens the first connection on a DB thread
+    logger.info("Connecting to DB2...")
     db_client = DB2Client()
-    db_client.connect()
-    print("✅ Database connection established")
+    await asyncio.get_running_loop().run_in_executor(app.state.db_pool, db_client.connect)
+    logger.info(f"Database connection established (up to {db_client.pool_size} per-thread connections)")
     
-    print("\n" + "="*60)
-    print("Chat Assist Service is ready!")
-    print("="*60 + "\n")
+    logger.info("Chat Assist Service is ready!")
+
+    yield
+
+    # Close every per-thread DB2 connection when FastAPI shuts down
+    app.state.db_pool.shutdown(wait=True)
+    db_client.close()
+    await sql_generator.aclose()
+
+# ---------------- FastAPI app ----------------
+
+app = FastAPI(
+    title="Chat Assist - Natural Language to SQL",
+    description="Convert natural language queries to SQL and execute against Skills Profile database",
+    version="1.0.0",
+    default_response_class=QueryJSONResponse,
+    lifespan=lifespan,
+)
 
-@app.post("/query", response_model=QueryResponse)
-def process_query(request: QueryRequest):
+# Compress large JSON/NDJSON results: zstd when the client accepts it, gzip otherwise
+app.add_middleware(ZstdMiddleware, level=3, minimum_size=1024, gzip_fallback=True)
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=list(CONFIG.cors_origins),
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.post("/query", response_model=None, responses={200: {"model": QueryResponse}})
+async def process_query(request: QueryRequest):
     try:
         user_query = request.user_query.strip()
         if not user_query:
             raise HTTPException(status_code=400, detail="Missing user query")
 
-        # Generate SQL from natural language
-        sql_query = sql_generator.generate_sql_query(user_query)
+        # Generate SQL from natural language (awaited on the shared async Watsonx client)
+        sql_query, sql_params = await sql_generator.generate_sql_query(
+            user_query, _user_context(request), request.use_cache
+        )
 
-        print("SQL part done")
-        # Execute the SQL query using DB2Client
-        results = db_client.execute_query(sql_query)
+        # Execute the SQL query as a cached prepared statement on the DB executor
+        loop = asyncio.get_running_loop()
+        if request.use_arrow:
+            def fetch():
+                return db_client.execute_arrow(sql_query, sql_params).to_pylist()
+        else:
+            def fetch():
+                return db_client.execute_prepared(sql_query, sql_params)
+        async with DB_SEM:
+            results = await loop.run_in_executor(app.state.db_pool, fetch)
 
-        return QueryResponse(
-            success=True,
-            natural_query=user_query,
-            generated_sql=sql_query,
-            results=results,
-            timestamp=datetime.now().isoformat()
-        )
+        # Returned directly: skips a recursive Pydantic validation pass over the rows
+        return QueryJSONResponse({
+            "success": True,
+            "natural_query": user_query,
+            "generated_sql": sql_query,
+            "sql_params": sql_params,
+            "results": results,
+            "timestamp": _now_iso(),
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-# ---------------- Shutdown hook ----------------
-@app.on_event("shutdown")
-def shutdown_event():
-    """Close DB connection when FastAPI shuts down."""
-    db_client.close()
+
+@app.post("/query/batch", response_model=None, responses={200: {"model": BatchQueryResponse}})
+async def batch_query(request: BatchQueryRequest):
+    """
+    Run several independent queries at once: SQL is generated concurrently
+    (up to SQL_GENERATE_CONCURRENCY at a time), then all statements run
+    concurrently across the pool.
+    A failing query is reported in its item without failing the batch.
+    """
+    user_queries = [q.strip() for q in request.queries]
+    if not all(user_queries):
+        raise HTTPException(status_code=400, detail="Missing user query")
+
+    generated = await sql_generator.generate_many(user_queries, _user_context(request))
+
+    loop = asyncio.get_running_loop()
+
+    async def run(sql_query, sql_params):
+        async with DB_SEM:
+            return await loop.run_in_executor(
+                app.state.db_pool, db_client.execute_prepared, sql_query, sql_params
+            )
+
+    async def skip(error):
+        return error
+
+    executed = await asyncio.gather(
+        *(skip(g) if isinstance(g, Exception) else run(*g) for g in generated),
+        return_exceptions=True,
+    )
+
+    items = []
+    for user_query, g, r in zip(user_queries, generated, executed):
+        item = {"success": not isinstance(r, Exception), "natural_query": user_query}
+        if not isinstance(g, Exception):
+            item["generated_sql"], item["sql_params"] = g
+        if isinstance(r, Exception):
+            item["error"] = str(r)
+        else:
+            item["results"] = r
+        items.append(item)
+
+    return QueryJSONResponse({
+        "success": all(item["success"] for item in items),
+        "items": items,
+        "timestamp": _now_iso(),
+    })
+
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """
+    Stream query results as newline-delimited JSON. Each line is a
+    column-oriented batch: {"columns": [...], "rows": [[...], ...]}.
+    With use_arrow each line is an Arrow record batch as {"COLUMN": [...], ...}.
+    """
+    user_query = request.user_query.strip()
+    if not user_query:
+        raise HTTPException(status_code=400, detail="Missing user query")
+
+    try:
+        sql_query, sql_params = await sql_generator.generate_sql_query(
+            user_query, _user_context(request), request.use_cache
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    loop = asyncio.get_running_loop()
+    if request.use_arrow:
+        # to_pydict() runs on the DB executor along with the fetch
+        batches = (b.to_pydict() for b in db_client.iter_arrow_batches(sql_query, sql_params))
+    else:
+        batches = db_client.iter_query(sql_query, sql_params)
+
+    queue = asyncio.Queue()
+    slots = threading.Semaphore(STREAM_PREFETCH)
+    cancelled = threading.Event()
+
+    def produce():
+        # The whole fetch runs on one executor thread: the generator is
+        # bound to that thread's DB2 connection.
+        try:
+            for batch in batches:
+                while not slots.acquire(timeout=0.1):
+                    if cancelled.is_set():
+                        return
+                loop.call_soon_threadsafe(queue.put_nowait, batch)
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            batches.close()
+
+    async def stop():
+        # Stops the producer and frees the DB slot
+        cancelled.set()
+        try:
+            await producer
+        finally:
+            DB_SEM.release()
+
+    # The first batch is fetched before the response starts, so a failing
+    # query is still reported as a 500 instead of a truncated stream
+    await DB_SEM.acquire()
+    producer = loop.run_in_executor(app.state.db_pool, produce)
+    try:
+        first = await queue.get()
+    except BaseException:
+        await stop()
+        raise
+    if isinstance(first, Exception):
+        await stop()
+        raise HTTPException(status_code=500, detail=str(first))
+
+    async def generate():
+        try:
+            batch = first
+            while batch is not None:
+                if isinstance(batch, Exception):
+                    raise batch
+                yield orjson.dumps(batch, default=serialize_json) + b"\n"
+                slots.release()
+                batch = await queue.get()
+        finally:
+            # Runs even if the client disconnects
+            await stop()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 @app.get("/")
 def health():
@@ -127,5 +363,12 @@ def health():
 
 # Run app directly with uvicorn
 if __name__ == "__main__":
-    port = int(os.environ.get("PORTT", 8080))
-    uvicorn.run("main:app", host="0.0.0.0", port=port)
+    uvicorn.run(
+        "main:app",
+        host=CONFIG.api_host,
+        port=CONFIG.api_port,
+        workers=CONFIG.api_workers,
+        loop="uvloop",
+        http="httptools",
+        log_level="warning",
+    )
@@ -0,0 +1,103 @@
+"""
+Keyword router for common natural language queries.
+
+Canonical question shapes (see templates.json) are matched with a single
+compiled regex alternation and answered with a ready-made parameterized SQL
+template, skipping the Watsonx round-trip. Anything that does not match
+falls through to the model.
+
+templates.json holds a list of entries:
+    name      - template identifier (used in logs)
+    pattern   - regex matched against the whole question (case-insensitive);
+                values to bind are captured with named groups
+    sql       - SQL with ? parameter markers
+    inline    - optional list of numeric groups written into the SQL itself
+                as {group} (for FETCH FIRST {n} ROWS ONLY, which stays inline)
+    params    - one spec per marker: a format string over the named groups,
+                {"int": group} for numeric values, {"lower": format} for
+                lower-cased LIKE patterns or {"context": key} for a value
+                from the asking user's context ("my ..." questions)
+
+Templates with context params only match when that context is available.
+Hits are counted so the routed share of traffic shows up in the logs;
+misses are logged at DEBUG to find new shapes worth adding.
+"""
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates.json")
+
+_GROUP_RE = re.compile(r"\(\?P<(\w+)>")
+_WS_RE = re.compile(r"\s+")
+
+
+class KeywordRouter:
+    def __init__(self, templates_path: str = DEFAULT_TEMPLATES_PATH):
+        with open(templates_path, encoding="utf-8") as f:
+            self.templates = json.load(f)
+
+        # One alternation for all templates: each template is wrapped in its own
+        # named group and its capture groups are prefixed to keep names unique.
+        alternatives = []
+        for i, template in enumerate(self.templates):
+            pattern = _GROUP_RE.sub(rf"(?P<t{i}_\1>", template["pattern"])
+            alternatives.append(f"(?P<t{i}>{pattern})")
+        self._pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+        self.hits = 0
+        self.lookups = 0
+
+        logger.info(f"Keyword router loaded {len(self.templates)} templates")
+
+    @staticmethod
+    def _normalize(natural_language_query: str) -> str:
+        """Collapse whitespace and drop trailing punctuation."""
+        return _WS_RE.sub(" ", natural_language_query).strip().rstrip("?.! ")
+
+    def route(self, natural_language_query: str, user_context: dict | None = None) -> tuple[str, list] | None:
+        """
+        Return (sql, params) for a query matching a template, or None.
+        """
+        self.lookups += 1
+        normalized = self._normalize(natural_language_query)
+        match = self._pattern.fullmatch(normalized)
+        if match is None:
+            logger.debug(f"Keyword router miss: {normalized}")
+            return None
+
+        prefix = match.lastgroup
+        template = self.templates[int(prefix[1:])]
+        groups = {
+            name[len(prefix) + 1:]: value
+            for name, value in match.groupdict().items()
+            if name.startswith(prefix + "_") and value is not None
+        }
+
+        params = []
+        for spec in template["params"]:
+            if isinstance(spec, str):
+                params.append(spec.format(**groups))
+            elif "int" in spec:
+                params.append(int(groups[spec["int"]]))
+            elif "context" in spec:
+                value = user_context.get(spec["context"]) if user_context else None
+                if value is None:
+                    logger.debug(f"Keyword router match without context: {template['name']}")
+                    return None
+                params.append(value)
+            else:
+                params.append(spec["lower"].format(**groups).lower())
+
+        sql = template["sql"]
+        if "inline" in template:
+            sql = sql.format(**{name: int(groups[name]) for name in template["inline"]})
+
+        self.hits += 1
+        logger.info(
+            f"Keyword router hit: {template['name']} "
+            f"({self.hits}/{self.lookups} = {self.hits / self.lookups:.0%} routed)"
+        )
+        return sql, params
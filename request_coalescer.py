@@ -0,0 +1,112 @@
+"""
+Coalesces concurrent SQL generation requests into batched model calls.
+
+Questions arriving within a short window that share the same prompt context
+are sent to the model together, so the static prompt prefix is processed
+once for the whole batch instead of once per question. Identical questions
+in flight at the same time share one result. A question arriving while
+nothing else is pending is generated right away, without waiting for the
+window.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCoalescer:
+    def __init__(
+        self,
+        run_one: Callable[[str, str], Awaitable],
+        run_batch: Callable[[str, list], Awaitable[list]],
+        window: float,
+        max_batch: int,
+    ):
+        """
+        run_one(key, item) is a coroutine answering a single item.
+        run_batch(key, items) is a coroutine returning one result per item,
+        or None for items the batch could not answer; those are retried
+        with run_one.
+        """
+        self.run_one = run_one
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = None
+        self._dispatcher = None
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._tasks = set()
+
+    async def submit(self, key: str, item: str):
+        """Queue item under key and wait for its (possibly batched) result."""
+        # Started lazily so the queue and task belong to the running loop
+        if self._dispatcher is None or self._dispatcher.done():
+            self._queue = asyncio.Queue()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        future = self._inflight.get((key, item))
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[(key, item)] = future
+            self._queue.put_nowait((key, item, future))
+        # Shielded: one waiter disconnecting must not cancel the shared result
+        return await asyncio.shield(future)
+
+    async def _dispatch(self):
+        """Collect requests for up to `window` seconds (or max_batch items) and group them by key."""
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            # Only wait for company when other requests are queued or generating
+            if not self._queue.empty() or len(self._inflight) > 1:
+                deadline = loop.time() + self.window
+                while len(pending) < self.max_batch:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        pending.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+            groups: dict[str, list] = {}
+            for key, item, future in pending:
+                groups.setdefault(key, []).append((item, future))
+            for key, entries in groups.items():
+                self._spawn(self._run(key, entries))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: str, entries: list):
+        """Run one batch; items it cannot answer (or a lone item) go through run_one."""
+        results = [None] * len(entries)
+        if len(entries) > 1:
+            try:
+                results = await self.run_batch(key, [item for item, _ in entries])
+            except Exception as e:
+                logger.warning(f"Batched generation failed, falling back to single calls: {e}")
+        singles = []
+        for (item, future), result in zip(entries, results):
+            if result is None:
+                singles.append(self._run_one(key, item, future))
+            else:
+                self._resolve(key, item, future, result)
+        await asyncio.gather(*singles)
+
+    async def _run_one(self, key: str, item: str, future: asyncio.Future):
+        try:
+            result = await self.run_one(key, item)
+        except Exception as e:
+            self._inflight.pop((key, item), None)
+            if not future.done():
+                future.set_exception(e)
+            return
+        self._resolve(key, item, future, result)
+
+    def _resolve(self, key: str, item: str, future: asyncio.Future, result):
+        self._inflight.pop((key, item), None)
+        if not future.done():
+            future.set_result(result)
@@ -0,0 +1,117 @@
+"""
+Semantic cache of generated SQL.
+
+Maps paraphrases of a question that was already answered ("show my
+expertise" / "list my skills") to the same SQL, using cosine similarity of
+the question embeddings. Recent entries are kept in a fixed-size ring buffer
+and searched with a single matrix-vector product.
+
+The current user's id is stored as a placeholder in the cached params, so
+"my ..." questions can be reused across users with their own id filled in.
+"""
+import re
+import threading
+import time
+
+import numpy as np
+
+_NUMBER_RE = re.compile(r"\d+")
+
+# Stands in for the asking user's id in cached params
+USER_ID_PARAM = object()
+
+
+def _numbers(text: str) -> frozenset:
+    return frozenset(_NUMBER_RE.findall(text))
+
+
+class SemanticCache:
+    def __init__(self, size: int, threshold: float, ttl: float):
+        self.size = size
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors = None  # allocated on first store, once the embedding size is known
+        self._entries = [None] * size
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(embedding) -> np.ndarray:
+        """Return the embedding as a unit float32 vector."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    @staticmethod
+    def _matches(entry: tuple, query: str, user_id) -> bool:
+        """
+        Similar wording is not enough: the new question must carry the same
+        numbers and every literal value bound by the cached SQL, so
+        "user_id 250" never reuses the SQL cached for "user_id 251".
+        """
+        _, cached_numbers, params, _ = entry
+        if _numbers(query) != cached_numbers:
+            return False
+        for param in params:
+            if param is USER_ID_PARAM:
+                if user_id is None:
+                    return False
+            elif isinstance(param, str) and param.strip("%").lower() not in query:
+                return False
+        return True
+
+    @staticmethod
+    def _inlines_context(sql: str, query: str, numbers: frozenset, user_context: dict) -> bool:
+        """
+        True when a user_context value the question does not mention is
+        written into the SQL text (e.g. "m.email = 'alice@ibm.com'"); such an
+        entry would answer the same question for every other user.
+        """
+        sql = sql.lower()
+        for value in user_context.values():
+            if value is None or isinstance(value, bool):
+                continue  # is_manager: a TRUE/FALSE literal identifies nobody
+            text = str(value).lower()
+            mentioned = text in numbers if isinstance(value, int) else text in query
+            if not mentioned and text in sql:
+                return True
+        return False
+
+    def lookup(self, vector: np.ndarray, query: str, user_context: dict | None) -> tuple[str, list] | None:
+        """Return (sql, params) cached for the closest earlier question, or None."""
+        query = query.strip().lower()
+        user_id = user_context.get("user_id") if user_context else None
+        with self._lock:
+            if not self._count:
+                return None
+            scores = self._vectors[:self._count] @ vector
+            best = int(scores.argmax())
+            entry = self._entries[best]
+        if scores[best] < self.threshold or time.monotonic() - entry[3] > self.ttl:
+            return None
+        if not self._matches(entry, query, user_id):
+            return None
+        sql, _, params, _ = entry
+        return sql, [user_id if p is USER_ID_PARAM else p for p in params]
+
+    def store(self, vector: np.ndarray, query: str, sql: str, params: list, user_context: dict | None):
+        """Remember the SQL generated for a question, replacing the oldest entry when full."""
+        query = query.strip().lower()
+        numbers = _numbers(query)
+        user_id = user_context.get("user_id") if user_context else None
+        if user_context and self._inlines_context(sql, query, numbers, user_context):
+            return  # a per-user value inlined into the SQL text: not safe to share
+        # Only an id that came from the context (not typed in the question) is per-user
+        if user_id is not None and str(user_id) not in numbers:
+            # Same type too, so True is not taken for user 1
+            params = [
+                USER_ID_PARAM if type(p) is type(user_id) and p == user_id else p for p in params
+            ]
+        entry = (sql, numbers, params, time.monotonic())
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.size, vector.shape[0]), dtype=np.float32)
+            self._vectors[self._next] = vector
+            self._entries[self._next] = entry
+            self._next = (self._next + 1) % self.size
+            self._count = min(self._count + 1, self.size)
@@ -1,20 +1,71 @@
 # filename: sql_query_service.py
 
 import os
+import re
+import gzip
+import asyncio
+import functools
+import hashlib
 import logging
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
-
-# Watsonx.ai SDK
-from ibm_watson_machine_learning.foundation_models import Model
+import httpx
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
+import _sqlfast
+from query_router import DEFAULT_TEMPLATES_PATH, KeywordRouter
+from sql_validator import InvalidSQLError, SQLValidator, parse_table_schemas
+from request_coalescer import RequestCoalescer
+from token_manager import TokenManager
+
 # Load .env
 load_dotenv()
 
+# Generated SQL cache (repeat questions skip the Watsonx round-trip)
+SQL_CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", "10000"))
+SQL_CACHE_TTL = int(os.getenv("SQL_CACHE_TTL", "600"))
+# Semantic cache: paraphrases of cached questions reuse their SQL (opt-in, needs an embedding model)
+WATSONX_EMBEDDING_MODEL_ID = os.getenv("WATSONX_EMBEDDING_MODEL_ID", "").strip()
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.93"))
+
+# Concurrent questions with the same context are batched into one model call
+# (window in milliseconds, 0 disables batching)
+SQL_BATCH_WINDOW_MS = int(os.getenv("SQL_BATCH_WINDOW_MS", "20"))
+SQL_BATCH_MAX = int(os.getenv("SQL_BATCH_MAX", "8"))
+
+# Generations one generate_many() call runs at the same time
+SQL_GENERATE_CONCURRENCY = int(os.getenv("SQL_GENERATE_CONCURRENCY", "8"))
+
+# Canonical query templates answered without Watsonx (empty to disable the router)
+SQL_ROUTER_TEMPLATES = os.getenv("SQL_ROUTER_TEMPLATES", DEFAULT_TEMPLATES_PATH)
+
+# Watsonx.ai REST API (called over one shared async HTTP/2 client)
+WATSONX_API_VERSION = "2023-05-29"
+HTTP_KEEPALIVE_CONNECTIONS = 64
+
+# Output token caps by question shape: COUNT queries are short, plain
+# lists a bit longer; anything else (joins, grouping) keeps the full budget.
+MAX_NEW_TOKENS_COUNT = 80
+MAX_NEW_TOKENS_LIST = 180
+MAX_NEW_TOKENS_DEFAULT = 250
+_COUNT_QUERY_RE = re.compile(r"\b(?:how many|count|number of)\b", re.IGNORECASE)
+_LIST_QUERY_RE = re.compile(r"\b(?:list|show|display|top \d+)\b", re.IGNORECASE)
+
+# Prompt plus output must fit the model's context window. The static prompt
+# is tokenized once at startup; the per-call part is estimated from its
+# length (conservatively, so the estimate errs high).
+WATSONX_CONTEXT_WINDOW = int(os.getenv("WATSONX_CONTEXT_WINDOW", "8192"))
+CHARS_PER_TOKEN = 3
+
+# Parses the PARAMS line that follows the generated SQL
+_PARAMS_RE = re.compile(r"^\s*PARAMS:\s*(\[.*\])\s*$", re.IGNORECASE | re.MULTILINE)
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,552 +74,30 @@ logger = logging.getLogger(__name__)
 # Database schema and examples
 # -----------------------------
 
-TABLE_SCHEMAS = """
-TABLE: users
-- user_id INTEGER PRIMARY KEY (unique user ID, auto-increment)
-- talent_id VARCHAR(20) UNIQUE NOT NULL (external IBM talent ID)
-- w3_id VARCHAR(50) UNIQUE NOT NULL (IBM W3 ID)
-- user_name VARCHAR(200) NOT NULL (full name of the user)
-- email VARCHAR(255) UNIQUE NOT NULL (email address)
-- profile_picture_url VARCHAR(500) (URL to profile picture)
-- job_role VARCHAR(200) (job role/title)
-- pjrs VARCHAR(255) (PJRS code - project/practice area)
-- user_role VARCHAR(10) DEFAULT 'DC' (role: DC, Manager, Admin)
-- manager_talent_id VARCHAR(20) (manager's talent ID)
-- manager_user_id INTEGER (FK to users.user_id - manager reference)
-- is_manager BOOLEAN DEFAULT FALSE (whether user is a manager)
-- is_active BOOLEAN DEFAULT TRUE (account active status)
-- created_at TIMESTAMP (record creation timestamp)
-- updated_at TIMESTAMP (record update timestamp)
-
-TABLE: products
-- product_id INTEGER PRIMARY KEY (unique product ID, auto-increment)
-- product_name VARCHAR(200) UNIQUE NOT NULL (product name)
-- product_icon VARCHAR(100) UNIQUE NOT NULL (product icon identifier)
-- category VARCHAR(100) NOT NULL (product category)
-- subcategory VARCHAR(100) (product subcategory)
-- product_description VARCHAR(1000) (product description)
-- vendor VARCHAR(50) DEFAULT 'IBM' (product vendor)
-- is_active BOOLEAN DEFAULT TRUE (product active status)
-- created_at TIMESTAMP (record creation timestamp)
-- updated_at TIMESTAMP (record update timestamp)
-
-TABLE: user_product_expertise
-- expertise_id INTEGER PRIMARY KEY (unique expertise record ID, auto-increment)
-- user_id INTEGER NOT NULL (FK to users.user_id)
-- product_id SMALLINT NOT NULL (FK to products.product_id)
-- assessment_level CHAR(2) (expertise assessment level: L1, L2, L3, L4)
-- expertise_implement BOOLEAN DEFAULT FALSE (can implement)
-- expertise_advise BOOLEAN DEFAULT FALSE (can advise)
-- expertise_design BOOLEAN DEFAULT FALSE (can design)
-- expertise_perform BOOLEAN DEFAULT FALSE (can perform)
-- project_count SMALLINT (number of projects with this product)
-- has_certification BOOLEAN DEFAULT FALSE (has certification for product)
-- certification_url VARCHAR(500) (URL to certification)
-- is_primary BOOLEAN DEFAULT FALSE NOT NULL (is this primary expertise)
-- record_version SMALLINT (version number for tracking changes)
-- approved_by INTEGER (FK to users.user_id - approver)
-- approved_at TIMESTAMP (approval timestamp)
-- is_active BOOLEAN DEFAULT TRUE (record active status)
-- created_at TIMESTAMP (record creation timestamp)
-- updated_at TIMESTAMP (record update timestamp)
-
-TABLE: user_product_assets
-- asset_id INTEGER PRIMARY KEY (unique asset ID, auto-increment)
-- user_id INTEGER NOT NULL (FK to users.user_id - asset owner)
-- product_id SMALLINT NOT NULL (FK to products.product_id)
-- asset_name VARCHAR(200) NOT NULL (name/title of the asset)
-- asset_description VARCHAR(1000) NOT NULL (detailed description)
-- repository_url VARCHAR(500) NOT NULL (URL to asset repository)
-- platform_type VARCHAR(50) NOT NULL (platform: GitHub, GitLab, etc.)
-- url_validated BOOLEAN DEFAULT FALSE (URL validation status)
-- users_count SMALLINT (number of users using this asset)
-- projects_count SMALLINT (number of projects using this asset)
-- time_saved_hours SMALLINT (estimated time saved in hours)
-- approval_status VARCHAR(20) (status: PENDING, APPROVED, REJECTED)
-- manager_feedback VARCHAR(2000) (manager's feedback)
-- approved_by INTEGER (FK to users.user_id - approver)
-- approved_at TIMESTAMP (approval timestamp)
-- record_version SMALLINT (version number)
-- is_active BOOLEAN DEFAULT TRUE (record active status)
-- created_at TIMESTAMP (record creation timestamp)
-- updated_at TIMESTAMP (record update timestamp)
-
-TABLE: user_product_knowledge_sharing
-- knowledge_id INTEGER PRIMARY KEY (unique knowledge sharing record ID, auto-increment)
-- user_id INTEGER NOT NULL (FK to users.user_id)
-- product_id SMALLINT NOT NULL (FK to products.product_id)
-- content_title VARCHAR(300) NOT NULL (title of shared content)
-- content_type VARCHAR(50) NOT NULL (type: Blog, Video, Tutorial, etc.)
-- content_url VARCHAR(500) NOT NULL (URL to content)
-- platform_type VARCHAR(50) NOT NULL (platform: Medium, YouTube, etc.)
-- url_validated BOOLEAN DEFAULT FALSE (URL validation status)
-- views_count INTEGER (number of views)
-- engagement_count INTEGER (engagement metrics)
-- reach_count INTEGER (reach metrics)
-- approval_status VARCHAR(20) (status: PENDING, APPROVED, REJECTED)
-- manager_feedback VARCHAR(2000) (manager's feedback)
-- approved_by INTEGER (FK to users.user_id - approver)
-- approved_at TIMESTAMP (approval timestamp)
-- record_version SMALLINT (version number)
-- is_active BOOLEAN DEFAULT TRUE (record active status)
-- created_at TIMESTAMP (record creation timestamp)
-- updated_at TIMESTAMP (record update timestamp)
-
-TABLE: submissions
-- submission_id INTEGER PRIMARY KEY (unique submission ID, auto-increment)
-- user_id INTEGER NOT NULL (FK to users.user_id - submitter)
-- manager_id INTEGER NOT NULL (FK to users.user_id - reviewing manager)
-- submission_type VARCHAR(20) NOT NULL (type: EXPERTISE, ASSETS, KNOWLEDGE)
-- submission_status VARCHAR(20) DEFAULT 'PENDING' (status: PENDING, APPROVED, REJECTED, PARTIAL)
-- total_items SMALLINT (total number of items in submission)
-- submitted_at TIMESTAMP (submission timestamp)
-- reviewed_at TIMESTAMP (review timestamp)
-- manager_feedback VARCHAR(2000) (overall manager feedback)
-- rejection_reason VARCHAR(500) (reason for rejection)
-- is_active BOOLEAN DEFAULT TRUE (record active status)
-- created_at TIMESTAMP (record creation timestamp)
-- updated_at TIMESTAMP (record update timestamp)
-
-TABLE: submission_items
-- item_id INTEGER PRIMARY KEY (unique item ID, auto-increment)
-- submission_id INTEGER NOT NULL (FK to submissions.submission_id)
-- item_type VARCHAR(20) NOT NULL (type: EXPERTISE, ASSET, KNOWLEDGE)
-- entity_id INTEGER NOT NULL (ID of the actual entity being submitted)
-- product_id SMALLINT NOT NULL (FK to products.product_id)
-- change_type VARCHAR(10) NOT NULL (type: CREATE, UPDATE, DELETE)
-- prev_value TEXT (previous value as JSON/text - CLOB in DB2)
-- new_value TEXT (new value as JSON/text - CLOB in DB2)
-- approval_status VARCHAR(20) DEFAULT 'PENDING' (status: PENDING, APPROVED, REJECTED)
-- rejection_reason VARCHAR(500) (reason for rejection)
-- reviewed_by INTEGER (FK to users.user_id - reviewer)
-- reviewed_at TIMESTAMP (review timestamp)
-- created_at TIMESTAMP (record creation timestamp)
-- updated_at TIMESTAMP (record update timestamp)
-
-TABLE: approvals
-- approval_id INTEGER PRIMARY KEY (unique approval ID, auto-increment)
-- submission_id INTEGER NOT NULL (FK to submissions.submission_id)
-- manager_id INTEGER NOT NULL (FK to users.user_id - approving manager)
-- decision VARCHAR(10) NOT NULL (decision: APPROVED, REJECTED)
-- rejection_reason VARCHAR(2000) (reason for rejection)
-- approval_feedback VARCHAR(2000) (approval feedback/comments)
-- created_at TIMESTAMP (approval timestamp)
-
-TABLE: notifications
-- notification_id INTEGER PRIMARY KEY (unique notification ID, auto-increment)
-- user_id INTEGER NOT NULL (FK to users.user_id - recipient)
-- notification_type VARCHAR(50) NOT NULL (type: SUBMISSION, APPROVAL, REJECTION, etc.)
-- notification_title VARCHAR(200) NOT NULL (notification title)
-- notification_message VARCHAR(1000) NOT NULL (notification message)
-- related_submission_id INTEGER (FK to submissions.submission_id - related submission)
-- is_read BOOLEAN DEFAULT FALSE (read status)
-- read_at TIMESTAMP (timestamp when notification was read)
-- created_at TIMESTAMP (notification creation timestamp)
-
-TABLE: pjrs_product_mapping
-- mapping_id INTEGER PRIMARY KEY (unique mapping ID, auto-increment)
-- pjrs VARCHAR(255) NOT NULL (PJRS code)
-- product_id SMALLINT NOT NULL (FK to products.product_id)
-- display_order SMALLINT DEFAULT 0 (display order for UI)
-- is_active BOOLEAN DEFAULT TRUE (mapping active status)
-- created_at TIMESTAMP (record creation timestamp)
-- updated_at TIMESTAMP (record update timestamp)
-
-TABLE: url_whitelist
-- whitelist_id SMALLINT PRIMARY KEY (unique whitelist ID, auto-increment)
-- platform_name VARCHAR(100) NOT NULL (name of platform)
-- domain_pattern VARCHAR(200) NOT NULL (domain pattern for validation)
-- platform_type VARCHAR(20) NOT NULL (type: internal, external)
-- url_type VARCHAR(50) NOT NULL (type: certification, repository, knowledge, all)
-- is_active BOOLEAN DEFAULT TRUE (whitelist active status)
-- created_at TIMESTAMP (record creation timestamp)
-- updated_at TIMESTAMP (record update timestamp)
-
-TABLE: error_log
-- error_id BIGINT PRIMARY KEY (unique error ID, auto-increment)
-- user_id INTEGER (FK to users.user_id)
-- error_type VARCHAR(50) NOT NULL (type of error)
-- error_code VARCHAR(50) (error code)
-- error_message VARCHAR(2000) NOT NULL (error message)
-- error_details TEXT (detailed error information - CLOB in DB2)
-- request_url VARCHAR(500) (URL where error occurred)
-- http_method VARCHAR(10) (HTTP method used)
-- ip_address VARCHAR(45) (IP address of requester)
-- user_agent VARCHAR(500) (user agent string)
-- created_at TIMESTAMP (error timestamp)
-"""
-
-# Sample SQL queries for few-shot learning
-SAMPLE_QUERIES = """
-==============================
-MANAGER & REPORTEE QUERIES
-==============================
-
-Example 1:
-Query: "Get manager name for user John Doe"
-SQL: SELECT u.user_name AS employee_name,
-       m.user_name AS manager_name
-FROM users u
-LEFT JOIN users m
-    ON u.manager_user_id = m.user_id
-WHERE LOWER(u.user_name) LIKE LOWER('%John Doe%')
-AND u.is_active = TRUE;
-
-
-Example 2:
-Query: "List all reportees for manager with talent_id T12345"
-SQL: SELECT u.user_id, u.user_name, u.email, u.job_role, u.talent_id
-FROM users u
-JOIN users m ON u.manager_user_id = m.user_id
-WHERE m.talent_id = 'T12345'
-AND u.is_active = TRUE
-ORDER BY u.user_name;
-
-Example 3:
-Query: "Show manager's name and email for user_id 500"
-SQL: SELECT u.user_id, u.user_name as employee_name, 
-m.user_id as manager_id, m.user_name as manager_name, 
-m.email as manager_email, m.talent_id as manager_talent_id
-FROM users u
-LEFT JOIN users m ON u.manager_user_id = m.user_id
-WHERE u.user_id = 500;
-
-Example 4:
-Query: "Count reportees for manager user_id 121"
-SQL: SELECT COUNT(u.user_id) as reportee_count
-FROM users u
-WHERE u.manager_user_id = 121
-AND u.is_active = TRUE;
-
-Example 5:
-Query: "List all managers and their reportee count"
-SQL: SELECT m.user_id, m.user_name, m.email, 
-COUNT(r.user_id) as reportee_count
-FROM users m
-LEFT JOIN users r ON r.manager_user_id = m.user_id AND r.is_active = TRUE
-WHERE m.is_manager = TRUE
-AND m.is_active = TRUE
-GROUP BY m.user_id, m.user_name, m.email
-ORDER BY reportee_count DESC;
-
-==============================
-USER EXPERTISE QUERIES
-==============================
-
-Example 6:
-Query: "Show all expertise for user John Doe including certifications"
-SQL: SELECT u.user_name, p.product_name, upe.assessment_level,
-upe.expertise_implement, upe.expertise_advise, upe.expertise_design, upe.expertise_perform,
-upe.has_certification, upe.certification_url, upe.is_primary, upe.project_count
-FROM user_product_expertise upe
-JOIN users u ON upe.user_id = u.user_id
-JOIN products p ON upe.product_id = p.product_id
-WHERE LOWER(u.user_name) LIKE LOWER('%john doe%')
-AND upe.is_active = TRUE
-ORDER BY upe.is_primary DESC, p.product_name;
-
-Example 7:
-Query: "List all users with API Connect certification"
-SQL: SELECT u.user_id, u.user_name, u.email, p.product_name, 
-upe.certification_url, upe.assessment_level
-FROM user_product_expertise upe
-JOIN users u ON upe.user_id = u.user_id
-JOIN products p ON upe.product_id = p.product_id
-WHERE LOWER(p.product_name) LIKE '%api connect%'
-AND upe.has_certification = TRUE
-AND upe.is_active = TRUE;
-
-Example 8:
-Query: "Get primary expertise for user_id 250"
-SQL: SELECT u.user_name, p.product_name, upe.assessment_level,
-upe.project_count, upe.has_certification
-FROM user_product_expertise upe
-JOIN users u ON upe.user_id = u.user_id
-JOIN products p ON upe.product_id = p.product_id
-WHERE u.user_id = 250
-AND upe.is_primary = TRUE
-AND upe.is_active = TRUE;
-
-Example 9:
-Query: "Show all L3 and L4 experts for IBM Cloud"
-SQL: SELECT u.user_id, u.user_name, u.email, p.product_name, 
-upe.assessment_level, upe.project_count
-FROM user_product_expertise upe
-JOIN users u ON upe.user_id = u.user_id
-JOIN products p ON upe.product_id = p.product_id
-WHERE LOWER(p.product_name) LIKE '%ibm cloud%'
-AND upe.assessment_level IN ('L3', 'L4')
-AND upe.is_active = TRUE
-ORDER BY upe.assessment_level DESC, u.user_name;
-
-==============================
-REPORTEE EXPERTISE QUERIES
-==============================
-
-Example 10:
-Query: "Show all expertise details for reportees of manager user_id 121"
-SQL: SELECT r.user_id, r.user_name, r.email, p.product_name,
-upe.assessment_level, upe.has_certification, upe.certification_url,
-upe.is_primary, upe.project_count
-FROM users r
-JOIN user_product_expertise upe ON r.user_id = upe.user_id
-JOIN products p ON upe.product_id = p.product_id
-WHERE r.manager_user_id = 121
-AND r.is_active = TRUE
-AND upe.is_active = TRUE
-ORDER BY r.user_name, upe.is_primary DESC;
-
-Example 11:
-Query: "List reportees with certifications for manager with talent_id T98765"
-SQL: SELECT r.user_id, r.user_name, r.email, p.product_name,
-upe.certification_url, upe.assessment_level
-FROM users r
-JOIN users m ON r.manager_user_id = m.user_id
-JOIN user_product_expertise upe ON r.user_id = upe.user_id
-JOIN products p ON upe.product_id = p.product_id
-WHERE m.talent_id = 'T98765'
-AND upe.has_certification = TRUE
-AND r.is_active = TRUE
-AND upe.is_active = TRUE
-ORDER BY r.user_name, p.product_name;
-
-Example 12:
-Query: "Count total certifications for all reportees of manager_id 121"
-SQL: SELECT COUNT(upe.expertise_id) as total_certifications
-FROM users r
-JOIN user_product_expertise upe ON r.user_id = upe.user_id
-WHERE r.manager_user_id = 121
-AND upe.has_certification = TRUE
-AND r.is_active = TRUE
-AND upe.is_active = TRUE;
-
-Example 13:
-Query: "Show reportees grouped by expertise level for manager user_id 300"
-SQL: SELECT upe.assessment_level, COUNT(DISTINCT r.user_id) as user_count
-FROM users r
-JOIN user_product_expertise upe ON r.user_id = upe.user_id
-WHERE r.manager_user_id = 300
-AND r.is_active = TRUE
-AND upe.is_active = TRUE
-GROUP BY upe.assessment_level
-ORDER BY upe.assessment_level;
-
-==============================
-ASSET & KNOWLEDGE QUERIES
-==============================
-
-Example 14:
-Query: "Top 5 users with most approved assets"
-SQL: SELECT u.user_id, u.user_name, COUNT(upa.asset_id) as asset_count
-FROM user_product_assets upa
-JOIN users u ON upa.user_id = u.user_id
-WHERE upa.approval_status = 'APPROVED'
-AND upa.is_active = TRUE
-GROUP BY u.user_id, u.user_name
-ORDER BY asset_count DESC
-FETCH FIRST 5 ROWS ONLY;
-
-Example 15:
-Query: "List all knowledge sharing content by user John Doe"
-SQL: SELECT u.user_name, p.product_name, upks.content_title, 
-upks.content_type, upks.platform_type, upks.views_count, 
-upks.engagement_count, upks.approval_status
-FROM user_product_knowledge_sharing upks
-JOIN users u ON upks.user_id = u.user_id
-JOIN products p ON upks.product_id = p.product_id
-WHERE LOWER(u.user_name) LIKE LOWER('%john doe%')
-AND upks.is_active = TRUE
-ORDER BY upks.created_at DESC;
-
-Example 16:
-Query: "Show reportees knowledge sharing metrics for manager_id 121"
-SQL: SELECT r.user_name, COUNT(upks.knowledge_id) as content_count,
-SUM(upks.views_count) as total_views,
-SUM(upks.engagement_count) as total_engagement
-FROM users r
-JOIN user_product_knowledge_sharing upks ON r.user_id = upks.user_id
-WHERE r.manager_user_id = 121
-AND upks.approval_status = 'APPROVED'
-AND r.is_active = TRUE
-AND upks.is_active = TRUE
-GROUP BY r.user_id, r.user_name
-ORDER BY total_views DESC;
-
-==============================
-SUBMISSION & APPROVAL QUERIES
-==============================
-
-Example 17:
-Query: "Show all pending submissions for manager_id 3243"
-SQL: SELECT s.submission_id, u.user_name, s.submission_type, s.total_items, s.submitted_at
-FROM submissions s
-JOIN users u ON s.user_id = u.user_id
-WHERE s.manager_id = 3243
-AND s.submission_status = 'PENDING'
-AND s.is_active = TRUE
-ORDER BY s.submitted_at DESC;
-
-Example 18:
-Query: "Recent notifications for user_id 100 that are unread"
-SQL: SELECT n.notification_id, n.notification_type, n.notification_title,
-n.notification_message, n.created_at
-FROM notifications n
-WHERE n.user_id = 100
-AND n.is_read = FALSE
-ORDER BY n.created_at DESC;
-
-Example 19:
-Query: "Users without any approved expertise"
-SQL: SELECT u.user_id, u.user_name, u.email
-FROM users u
-LEFT JOIN user_product_expertise upe ON u.user_id = upe.user_id
-AND upe.is_active = TRUE
-AND upe.approved_by IS NOT NULL
-WHERE upe.expertise_id IS NULL
-AND u.is_active = TRUE
-AND u.user_role = 'DC';
-
-==============================
-PJRS & PRODUCT MAPPING
-==============================
-
-Example 20:
-Query: "Show products mapped to PJRS code ABC123"
-SQL: SELECT p.product_id, p.product_name, p.category, ppm.display_order
-FROM pjrs_product_mapping ppm
-JOIN products p ON ppm.product_id = p.product_id
-WHERE ppm.pjrs = 'ABC123'
-AND ppm.is_active = TRUE
-AND p.is_active = TRUE
-ORDER BY ppm.display_order;
-
-Example 21:
-Query: "List users in same PJRS as user John Doe"
-SQL: SELECT u2.user_id, u2.user_name, u2.email, u2.job_role
-FROM users u1
-JOIN users u2 ON u1.pjrs = u2.pjrs
-WHERE LOWER(u1.user_name) LIKE LOWER('%john doe%')
-AND u2.user_id != u1.user_id
-AND u1.is_active = TRUE
-AND u2.is_active = TRUE;
-"""
-
-# -----------------------------
-# SQL Query Generator Class
-# -----------------------------
-
-class SQLQueryGenerator:
-    def __init__(self):
-        # Load credentials safely
-        self.watson_url = os.getenv("WATSONX_URL", "").strip()
-        self.project_id = os.getenv("WATSONX_PROJECT_ID", "").strip()
-        self.model_id = os.getenv("WATSONX_MODEL_ID", "").strip()
-        self.api_key = os.getenv("WATSONX_API_KEY", "").strip()
-
-        logger.info(f"Initializing Watsonx model at {self.watson_url}")
-
-        if not all([self.watson_url, self.project_id, self.model_id, self.api_key]):
-            raise ValueError("Missing Watsonx.ai credentials in environment variables")
-
-        credentials = {
-            "url": self.watson_url,
-            "apikey": self.api_key,
-        }
-
-        model_params = {
-            "decoding_method": "greedy",
-            "max_new_tokens": 250,
-            "min_new_tokens": 10,
-            "repetition_penalty": 1.1,
-        }
-
-        try:
-            self.model = Model(
-                model_id=self.model_id,
-                credentials=credentials,
-                project_id=self.project_id,
-                params=model_params,
-            )
-            logger.info("Watsonx model initialized successfully")
-        except Exception as e:
-            logger.error(f"Watsonx initialization failed: {str(e)}")
-            raise
+# Directory of the gzip-compressed prompt resources (point it elsewhere to try
+# another schema or example set without code changes)
+SQL_PROMPTS_DIR = os.getenv(
+    "SQL_PROMPTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+)
 
-    # -----------------------------
-    # SQL Cleaner
-    # -----------------------------
-    def clean_sql_query(self, generated_text: str) -> str:
-        """Extract and clean SQL returned by Watsonx."""
-        if "```sql" in generated_text:
-            generated_text = generated_text.split("```sql")[1].split("```")[0]
 
-        lines = generated_text.strip().split("\n")
-        sql_lines = []
+@functools.cache
+def load_prompt(name: str) -> str:
+    """Read and decompress one prompt resource from SQL_PROMPTS_DIR."""
+    with open(os.path.join(SQL_PROMPTS_DIR, name), "rb") as f:
+        return gzip.decompress(f.read()).decode("utf-8")
 
-        for line in lines:
-            line = line.strip()
-            if line and not line.lower().startswith(
-                ("here", "the", "this", "note:", "explanation:")
-            ):
-                if line.lower().startswith("sql:"):
-                    line = line[4:].strip()
-                sql_lines.append(line)
 
-        sql_query = " ".join(sql_lines).replace(";", "").strip()
+TABLE_SCHEMAS = load_prompt("schema.txt.gz")
 
-        if not sql_query.upper().startswith("SELECT"):
-            raise ValueError("Generated output is not a valid SELECT statement")
+# {table: {columns}} for validating generated SQL offline
+SCHEMA = parse_table_schemas(TABLE_SCHEMAS)
 
-        return sql_query
-
-    # -----------------------------
-    # SQL Generation
-    # -----------------------------
-    def generate_sql_query(self, natural_language_query: str, user_context: dict | None = None) -> str:
-
-        """
-        Generate SQL query from natural language using Watsonx.
-        """
-        logger.info("Generating SQL query from user request")
-        context_block = ""
-        print("Contextual inform ", user_context)
-
-        if user_context:
-            context_block = f"""
-                ==============================
-                CURRENT USER CONTEXT
-                ==============================
-                The logged-in user information:
-                
-                user_id: {user_context.get("user_id")}
-                talent_id: {user_context.get("talent_id")}
-                user_name: {user_context.get("user_name")}
-                email: {user_context.get("email")}
-                is_manager: {user_context.get("is_manager")}
-                
-                CONTEXT RULES:
-                --------------
-                If the user query contains words like:
-                - "my"
-                - "me"
-                - "mine"
-                
-                You MUST interpret them as referring to:
-                users.user_id = {user_context.get("user_id")}
-                
-                Example:
-                "Show my expertise"
-                → WHERE users.user_id = {user_context.get("user_id")}
-                
-                "Show my submissions"
-                → submissions.user_id = {user_context.get("user_id")}
-                
-                "Who is my manager?"
-                → lookup manager using manager_user_id.
-                """
+# Sample SQL queries for few-shot learning
+SAMPLE_QUERIES = load_prompt("samples.txt.gz")
 
-        system_prompt = f"""
+# Static instructions that open every prompt
+PROMPT_INSTRUCTIONS = """
 You are an expert DB2 SQL developer generating production-ready SQL.
 Use ONLY the provided database schema.
 Do NOT invent tables or columns.
@@ -654,38 +183,6 @@ Typical workflow:
     - reach
     - platform type
 
-==============================
-COMMON ANALYTICAL QUESTIONS
-==============================
-
-Users may ask for:
-• Their expertise details
-• Approved contributions
-• Pending approvals
-• Submission history
-• Contribution metrics
-• Asset usage statistics
-• Knowledge sharing impact
-• Managers and their teams
-• Number of reportees under manager
-• Details of reportees
-• Reportees expertise and certifications
-• Manager's name for a user
-• Users reporting to a specific manager
-• Managers pending approvals
-• Contribution status tracking
-• Approval analytics
-• Top contributors
-• Users without contributions
-• Expertise per product
-• Certified users
-• Primary expertise holders
-• Submission rejection reasons
-• Notifications
-• Approval timelines
-• PJRS-based product recommendations
-• Team collaboration metrics
-
 ==============================
 QUERY RULES
 ==============================
@@ -699,9 +196,33 @@ GENERAL RULES
 - Use DB2 syntax.
 - Use FETCH FIRST N ROWS ONLY for limits.
 - Do not generate UPDATE/DELETE.
-- Return only executable SELECT SQL.
+- Return only executable SELECT SQL followed by its PARAMS line.
 - No explanations.
 
+PARAMETER RULE (STRICT)
+-----------------------
+Never inline values taken from the user's request.
+Use a ? parameter marker for every such value:
+- user IDs, manager IDs, talent IDs
+- user names, product names, emails, PJRS codes
+- titles and any other search text
+
+Keep fixed values inline:
+- TRUE / FALSE
+- status and level codes ('APPROVED', 'L3', ...)
+- FETCH FIRST N ROWS ONLY limits
+
+End the SQL with ; and then write one line:
+PARAMS: <JSON array with one value per ?, in order of appearance>
+
+For partial matching put the % wildcards inside the value
+and write the value in lower case:
+WHERE LOWER(u.user_name) LIKE ?
+PARAMS: ["%john doe%"]
+
+If there are no ? markers write:
+PARAMS: []
+
 MANAGER RULES
 --------------
 - Manager status must use users.is_manager column.
@@ -768,7 +289,8 @@ USER SEARCH RULES
 -----------------
 Users may provide partial names.
 Always use partial matching:
-LOWER(user_name) LIKE LOWER('%value%')
+LOWER(user_name) LIKE ?
+PARAMS: ["%value%"]  (lower case)
 
 Never use exact match unless ID provided.
 Apply same logic for:
@@ -796,7 +318,7 @@ Submission and approval statuses may appear in mixed case.
 
 Always compare statuses using:
 
-UPPER(column) LIKE UPPER('%VALUE%')
+UPPER(column) LIKE '%VALUE%'
 
 Never use:
 column = 'VALUE'
@@ -819,8 +341,8 @@ Rejected submissions include:
 rejected
 
 Examples:
-UPPER(s.submission_status) LIKE UPPER('%PENDING%')
-UPPER(si.approval_status) LIKE UPPER('%APPROVED%')
+UPPER(s.submission_status) LIKE '%PENDING%'
+UPPER(si.approval_status) LIKE '%APPROVED%'
 
 
 COUNT VS LIST RULE
@@ -853,8 +375,11 @@ TEXT COMPARISON RULE (STRICT)
 ------------------------------
 For ALL user-provided text filters:
 
-ALWAYS use partial matching:
-LOWER(column) LIKE LOWER('%value%')
+ALWAYS use partial matching with a ? marker:
+LOWER(column) LIKE ?
+and bind the lower-cased pattern in PARAMS: ["%value%"]
+
+NEVER inline the search text and NEVER wrap the ? in LOWER().
 
 NEVER use equality (=) for text fields.
 
@@ -899,8 +424,17 @@ When asking for full expertise details include:
 - has_certification, certification_url
 - is_primary
 - project_count
+"""
+
+# -----------------------------
+# Static prompt parts
+# -----------------------------
+
+# Everything static comes first so the prompt prefix is byte-identical on
+# every call (and cacheable by the serving side); only the user context and
+# the question follow it.
+STATIC_PROMPT_PREFIX = PROMPT_INSTRUCTIONS + f"""
 
-{context_block}
 
 ==============================
 DATABASE SCHEMA
@@ -919,24 +453,532 @@ TASK
 ==============================
 
 Convert the natural language request into correct DB2 SQL.
+"""
+STATIC_PROMPT_SUFFIX = "\nNatural Language Query:\n"
+STATIC_PROMPT_TAIL = "\n\nSQL Query:\n"
 
-Natural Language Query:
-{natural_language_query}
+# Batched variant: numbered questions in, one JSON array of SQL out
+BATCH_PROMPT_SUFFIX = "\nNatural Language Queries (numbered):\n"
+BATCH_PROMPT_TAIL = """
 
-SQL Query:
+Write the SQL for every numbered query above, following all rules.
+Return ONLY a JSON array with one object per query, in order:
+[{"i": 1, "sql": "<DB2 SELECT with ? markers>", "params": [<one value per ?>]}, ...]
+
+JSON:
 """
 
+# Per-user block inserted after the static prefix; filled with str.format
+USER_CONTEXT_TEMPLATE = """
+                ==============================
+                CURRENT USER CONTEXT
+                ==============================
+                The logged-in user information:
+                
+                user_id: {user_id}
+                talent_id: {talent_id}
+                user_name: {user_name}
+                email: {email}
+                is_manager: {is_manager}
+                
+                CONTEXT RULES:
+                --------------
+                If the user query contains words like:
+                - "my"
+                - "me"
+                - "mine"
+                
+                You MUST interpret them as referring to:
+                users.user_id = ? with {user_id} in PARAMS
+                
+                Example:
+                "Show my expertise"
+                → WHERE users.user_id = ?
+                → PARAMS: [{user_id}]
+                
+                "Show my submissions"
+                → submissions.user_id = ?
+                → PARAMS: [{user_id}]
+                
+                "Who is my manager?"
+                → lookup manager using manager_user_id.
+                """
+
+
+def _json_fragment(text: str) -> bytes:
+    """Encode text as the inside of a JSON string literal."""
+    return orjson.dumps(text)[1:-1]
+
+
+# The same parts pre-encoded for the request body, so only the user context
+# and question are escaped and encoded per call.
+STATIC_PROMPT_PREFIX_JSON = _json_fragment(STATIC_PROMPT_PREFIX)
+STATIC_PROMPT_SUFFIX_JSON = _json_fragment(STATIC_PROMPT_SUFFIX)
+STATIC_PROMPT_TAIL_JSON = _json_fragment(STATIC_PROMPT_TAIL)
+# Appended to the question when the first answer failed schema validation
+CORRECTION_PROMPT = """
+
+Previous SQL:
+{sql}
+This SQL is invalid: {error}.
+Rewrite it using only the tables and columns listed in the DATABASE SCHEMA."""
+
+BATCH_PROMPT_SUFFIX_JSON = _json_fragment(BATCH_PROMPT_SUFFIX)
+BATCH_PROMPT_TAIL_JSON = _json_fragment(BATCH_PROMPT_TAIL)
+
+# -----------------------------
+# SQL Query Generator Class
+# -----------------------------
+
+class SQLQueryGenerator:
+    def __init__(self):
+        # Load credentials safely
+        self.watson_url = os.getenv("WATSONX_URL", "").strip()
+        self.project_id = os.getenv("WATSONX_PROJECT_ID", "").strip()
+        self.model_id = os.getenv("WATSONX_MODEL_ID", "").strip()
+        self.api_key = os.getenv("WATSONX_API_KEY", "").strip()
+
+        logger.info(f"Initializing Watsonx model at {self.watson_url}")
+        logger.info(f"SQL cleaner: {'mypyc-compiled' if _sqlfast.COMPILED else 'pure Python'}")
+
+        if not all([self.watson_url, self.project_id, self.model_id, self.api_key]):
+            raise ValueError("Missing Watsonx.ai credentials in environment variables")
+
+        self.model_params = {
+            "decoding_method": "greedy",
+            "max_new_tokens": MAX_NEW_TOKENS_DEFAULT,
+            "min_new_tokens": 10,
+            "repetition_penalty": 1.1,
+        }
+        self._generate_url = (
+            f"{self.watson_url.rstrip('/')}/ml/v1/text/generation?version={WATSONX_API_VERSION}"
+        )
+        self._stream_url = (
+            f"{self.watson_url.rstrip('/')}/ml/v1/text/generation_stream?version={WATSONX_API_VERSION}"
+        )
+        self._tokenize_url = (
+            f"{self.watson_url.rstrip('/')}/ml/v1/text/tokenization?version={WATSONX_API_VERSION}"
+        )
+        self._embeddings_url = (
+            f"{self.watson_url.rstrip('/')}/ml/v1/text/embeddings?version={WATSONX_API_VERSION}"
+        )
+
+        # One shared HTTP/2 client for IAM, generation and embedding calls, so
+        # concurrent requests multiplex over kept-alive TLS connections.
+        limits = httpx.Limits(max_keepalive_connections=HTTP_KEEPALIVE_CONNECTIONS)
+        self._client = httpx.AsyncClient(
+            http2=True,
+            limits=limits,
+            timeout=httpx.Timeout(120, connect=10),
+            transport=httpx.AsyncHTTPTransport(http2=True, limits=limits, retries=2),
+        )
+
+        # The only source of IAM tokens for every outbound Watsonx request
+        self.tokens = TokenManager(self.api_key, self._client)
+
+        # Generation request body up to the prompt, with the static prompt
+        # prefix already JSON-encoded; "parameters" follows the prompt.
+        envelope = orjson.dumps({"model_id": self.model_id, "project_id": self.project_id})
+        self._body_head = envelope[:-1] + b',"input":"' + STATIC_PROMPT_PREFIX_JSON
+        # One pre-encoded tail per output token cap
+        self._body_tails = {
+            cap: self._body_tail(cap)
+            for cap in (MAX_NEW_TOKENS_COUNT, MAX_NEW_TOKENS_LIST, MAX_NEW_TOKENS_DEFAULT)
+        }
+
+        # Replaced by the exact count in connect()
+        self.static_prompt_tokens = self._estimate_tokens(
+            STATIC_PROMPT_PREFIX + STATIC_PROMPT_SUFFIX + STATIC_PROMPT_TAIL
+        )
+
+        self.validator = SQLValidator(SCHEMA)
+        self.router = KeywordRouter(SQL_ROUTER_TEMPLATES) if SQL_ROUTER_TEMPLATES else None
+
+        # Only touched from the event loop, so no lock is needed
+        self._sql_cache = TTLCache(maxsize=SQL_CACHE_SIZE, ttl=SQL_CACHE_TTL)
+        self._coalescer = (
+            RequestCoalescer(
+                self._generate_one, self._generate_batch, SQL_BATCH_WINDOW_MS / 1000, SQL_BATCH_MAX
+            )
+            if SQL_BATCH_WINDOW_MS > 0 and SQL_BATCH_MAX > 1 else None
+        )
+        self._semantic_cache = None
+        if WATSONX_EMBEDDING_MODEL_ID:
+            # Imported here so numpy is only loaded when the semantic cache is on
+            from semantic_cache import SemanticCache
+            self._semantic_cache = SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, SQL_CACHE_TTL)
+
+    async def connect(self):
+        """Fetch the first IAM token, so bad credentials fail at startup."""
+        try:
+            await self.tokens.get_token()
+            logger.info("Watsonx model initialized successfully")
+        except Exception as e:
+            logger.error(f"Watsonx initialization failed: {str(e)}")
+            raise
+
         try:
-            response = self.model.generate_text(
-                prompt=system_prompt,
-                guardrails=False,
+            self.static_prompt_tokens = await self._count_tokens(
+                STATIC_PROMPT_PREFIX + STATIC_PROMPT_SUFFIX + STATIC_PROMPT_TAIL
             )
+            logger.info(f"Static prompt: {self.static_prompt_tokens} tokens")
+        except Exception as e:
+            logger.warning(f"Tokenization failed, estimating static prompt size: {e}")
 
-            sql_query = self.clean_sql_query(response)
-            sql_query = sql_query.strip().replace("\n", " ")
-            logger.info(f"Generated SQL: {sql_query}")
-            return sql_query
+    async def aclose(self):
+        """Close the shared HTTP client."""
+        await self._client.aclose()
+
+    # -----------------------------
+    # Watsonx REST client
+    # -----------------------------
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    async def _count_tokens(self, text: str) -> int:
+        """Count the tokens of text with the model's own tokenizer."""
+        response = await self._client.post(
+            self._tokenize_url,
+            content=orjson.dumps({"model_id": self.model_id, "project_id": self.project_id, "input": text}),
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {await self.tokens.get_token()}",
+            },
+            timeout=30,
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)["result"]["token_count"]
+
+    def _output_budget(self, cap: int, dynamic_text: str) -> int:
+        """
+        Clamp an output token cap to what is left of the context window after
+        the prompt, and fail early (without a model call) if nothing useful is.
+        """
+        prompt_tokens = self.static_prompt_tokens + self._estimate_tokens(dynamic_text)
+        budget = min(cap, WATSONX_CONTEXT_WINDOW - prompt_tokens)
+        if budget < self.model_params["min_new_tokens"]:
+            raise ValueError(
+                f"Prompt of ~{prompt_tokens} tokens does not fit the {WATSONX_CONTEXT_WINDOW}-token context window"
+            )
+        return budget
+
+    def _body_tail(self, max_new_tokens: int) -> bytes:
+        return STATIC_PROMPT_TAIL_JSON + b'","parameters":' + orjson.dumps({
+            **self.model_params,
+            "max_new_tokens": max_new_tokens,
+        }) + b"}"
+
+    @staticmethod
+    def max_new_tokens(natural_language_query: str) -> int:
+        """Pick the output token cap from the shape of the question."""
+        if _COUNT_QUERY_RE.search(natural_language_query):
+            return MAX_NEW_TOKENS_COUNT
+        if _LIST_QUERY_RE.search(natural_language_query):
+            return MAX_NEW_TOKENS_LIST
+        return MAX_NEW_TOKENS_DEFAULT
+
+    def _request_body(
+        self, context_block: str, natural_language_query: str, max_new_tokens: int, correction: str = ""
+    ) -> bytes:
+        """Build the JSON generation request, encoding only the per-call prompt parts."""
+        return b"".join((
+            self._body_head,
+            _json_fragment(context_block),
+            STATIC_PROMPT_SUFFIX_JSON,
+            _json_fragment(natural_language_query + correction),
+            self._body_tails.get(max_new_tokens) or self._body_tail(max_new_tokens),
+        ))
+
+    def _batch_request_body(self, context_block: str, queries: list) -> bytes:
+        """Build the generation request for several numbered questions at once."""
+        listing = "\n".join(f"{i}. {q}" for i, q in enumerate(queries, 1))
+        parameters = {
+            **self.model_params,
+            "max_new_tokens": self._output_budget(
+                sum(self.max_new_tokens(q) for q in queries), context_block + BATCH_PROMPT_TAIL + listing
+            ),
+        }
+        return b"".join((
+            self._body_head,
+            _json_fragment(context_block),
+            BATCH_PROMPT_SUFFIX_JSON,
+            _json_fragment(listing),
+            BATCH_PROMPT_TAIL_JSON,
+            b'","parameters":',
+            orjson.dumps(parameters),
+            b"}",
+        ))
+
+    async def _generate_text(self, body: bytes) -> tuple[str, str]:
+        """Run one text generation request; returns the generated text and the stop reason."""
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        token = await self.tokens.get_token()
+        response = await self._client.post(
+            self._generate_url,
+            content=body,
+            headers={**headers, "Authorization": f"Bearer {token}"},
+        )
+        if response.status_code == 401:
+            # Token revoked or expired early: refresh once and retry
+            token = await self.tokens.invalidate(token)
+            response = await self._client.post(
+                self._generate_url,
+                content=body,
+                headers={**headers, "Authorization": f"Bearer {token}"},
+            )
+        response.raise_for_status()
+        result = orjson.loads(response.content)["results"][0]
+        return result["generated_text"], result.get("stop_reason")
+
+    @staticmethod
+    def _answer_complete(text: str) -> bool:
+        """True once the SQL has ended and a full PARAMS line has followed it."""
+        if ";" not in text:
+            return False
+        match = _PARAMS_RE.search(text)
+        if match is None:
+            return False
+        try:
+            orjson.loads(match.group(1))
+        except orjson.JSONDecodeError:
+            return False
+        return True
+
+    async def _generate_text_stream(self, body: bytes) -> tuple[str, str]:
+        """
+        Stream one generation request and stop reading as soon as the answer
+        is complete, instead of waiting for the model to use up its budget.
+        Returns the text received so far and the last stop reason.
+        """
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+        token = await self.tokens.get_token()
+        for attempt in range(2):
+            async with self._client.stream(
+                "POST",
+                self._stream_url,
+                content=body,
+                headers={**headers, "Authorization": f"Bearer {token}"},
+            ) as response:
+                if response.status_code == 401 and attempt == 0:
+                    # Token revoked or expired early: refresh once and retry
+                    token = await self.tokens.invalidate(token)
+                    continue
+                response.raise_for_status()
+
+                text = ""
+                stop_reason = None
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    result = orjson.loads(line[5:])["results"][0]
+                    text += result.get("generated_text", "")
+                    stop_reason = result.get("stop_reason")
+                    if "]" in result.get("generated_text", "") and self._answer_complete(text):
+                        # Leaving the block closes the stream, ending generation server-side
+                        stop_reason = "answer_complete"
+                        break
+                return text, stop_reason
+
+    async def _embed(self, text: str):
+        """Return the unit embedding of text from the Watsonx embeddings endpoint."""
+        response = await self._client.post(
+            self._embeddings_url,
+            content=orjson.dumps({
+                "inputs": [text.strip().lower()],
+                "model_id": WATSONX_EMBEDDING_MODEL_ID,
+                "project_id": self.project_id,
+            }),
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {await self.tokens.get_token()}",
+            },
+            timeout=30,
+        )
+        response.raise_for_status()
+        return self._semantic_cache.normalize(orjson.loads(response.content)["results"][0]["embedding"])
+
+    async def _generate_batch(self, context_block: str, queries: list) -> list:
+        """
+        Generate SQL for several questions sharing one context block in a
+        single model call. Returns (sql, params) per question, or None where
+        the model's answer is missing or invalid.
+        """
+        response, _ = await self._generate_text(self._batch_request_body(context_block, queries))
+        start, end = response.find("["), response.rfind("]")
+        items = orjson.loads(response[start:end + 1]) if 0 <= start < end else []
+
+        results = [None] * len(queries)
+        for item in items:
+            try:
+                i = int(item["i"]) - 1
+                sql_query = self.clean_sql_query(item["sql"])
+                sql_params = item.get("params") or []
+                if 0 <= i < len(queries) and len(sql_params) == sql_query.count("?"):
+                    results[i] = (sql_query, sql_params)
+            except (KeyError, TypeError, ValueError):
+                continue
+        logger.info(f"Batched generation answered {sum(r is not None for r in results)}/{len(queries)} queries")
+        return results
+
+    async def _generate_one(self, context_block: str, natural_language_query: str) -> tuple[str, list]:
+        """Generate the SQL for one question, with one self-correction pass if it fails validation."""
+        try:
+            return await self._generate_single(context_block, natural_language_query)
+        except InvalidSQLError as e:
+            # Show the model its SQL and what is wrong with it
+            logger.info(f"Generated SQL failed schema validation ({e}), asking for a correction")
+            return await self._generate_single(
+                context_block,
+                natural_language_query,
+                CORRECTION_PROMPT.format(sql=e.sql_query, error=e),
+            )
+
+    async def _generate_single(
+        self, context_block: str, natural_language_query: str, correction: str = ""
+    ) -> tuple[str, list]:
+        """Generate, clean and validate the SQL for one question in its own model call."""
+        dynamic_text = context_block + natural_language_query + correction
+        max_new_tokens = self._output_budget(self.max_new_tokens(natural_language_query), dynamic_text)
+        full_budget = self._output_budget(MAX_NEW_TOKENS_DEFAULT, dynamic_text)
+        response, stop_reason = await self._generate_text_stream(
+            self._request_body(context_block, natural_language_query, max_new_tokens, correction)
+        )
+        if stop_reason == "max_tokens" and max_new_tokens < full_budget:
+            # The tighter cap cut the answer short: retry with the full budget
+            logger.info(f"Output hit the {max_new_tokens}-token cap, retrying with {full_budget}")
+            response, _ = await self._generate_text_stream(
+                self._request_body(context_block, natural_language_query, full_budget, correction)
+            )
+        sql_query = self.clean_sql_query(response)
+        sql_query = sql_query.strip().replace("\n", " ")
+        return sql_query, self.extract_params(response, sql_query)
+
+    # -----------------------------
+    # SQL Cache
+    # -----------------------------
+    @staticmethod
+    def _cache_key(natural_language_query: str, user_context: dict | None) -> tuple:
+        """Key the normalized query by the user it was generated for."""
+        digest = hashlib.blake2b(natural_language_query.strip().lower().encode(), digest_size=16).digest()
+        if not user_context:
+            return digest, None, None
+        return digest, user_context.get("user_id"), user_context.get("is_manager")
+
+    # -----------------------------
+    # SQL Cleaner
+    # -----------------------------
+    def clean_sql_query(self, generated_text: str) -> str:
+        """
+        Extract and clean SQL returned by Watsonx (see _sqlfast.clean_sql_query)
+        and check its tables and columns against the schema.
+        """
+        sql_query = _sqlfast.clean_sql_query(generated_text)
+        self.validator.validate(sql_query)
+        return sql_query
+
+    def extract_params(self, generated_text: str, sql_query: str) -> list:
+        """Parse the PARAMS line returned by Watsonx and check it matches the ? markers."""
+        match = _PARAMS_RE.search(generated_text)
+        params = orjson.loads(match.group(1)) if match else []
+
+        if not isinstance(params, list) or len(params) != sql_query.count("?"):
+            raise ValueError("Generated PARAMS do not match the SQL parameter markers")
+
+        return params
+
+    # -----------------------------
+    # SQL Generation
+    # -----------------------------
+    async def generate_sql_query(
+        self,
+        natural_language_query: str,
+        user_context: dict | None = None,
+        use_cache: bool = True,
+    ) -> tuple[str, list]:
+
+        """
+        Generate SQL query from natural language using Watsonx.
+        Returns the SQL with ? parameter markers and the list of values to bind.
+        use_cache=False always asks the model. Manager contexts are never
+        cached, so their SQL is regenerated (and re-authorized) every time.
+        """
+        logger.info("Generating SQL query from user request")
+        if self.router is not None:
+            routed = self.router.route(natural_language_query, user_context)
+            if routed is not None:
+                return routed
+
+        use_cache = use_cache and not (user_context and user_context.get("is_manager"))
+        if use_cache:
+            cache_key = self._cache_key(natural_language_query, user_context)
+            cached_sql = self._sql_cache.get(cache_key)
+            if cached_sql is not None:
+                logger.info(f"SQL cache hit: {cached_sql[0]}")
+                return cached_sql
+
+        embedding = None
+        if use_cache and self._semantic_cache is not None:
+            try:
+                embedding = await self._embed(natural_language_query)
+            except Exception as e:
+                logger.warning(f"Embedding failed, skipping semantic cache: {e}")
+            if embedding is not None:
+                cached_sql = self._semantic_cache.lookup(embedding, natural_language_query, user_context)
+                if cached_sql is not None:
+                    logger.info(f"Semantic cache hit: {cached_sql[0]}")
+                    self._sql_cache[cache_key] = cached_sql
+                    return cached_sql
+
+        context_block = ""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"User context: {user_context}")
+
+        if user_context:
+            context_block = USER_CONTEXT_TEMPLATE.format(
+                user_id=user_context.get("user_id"),
+                talent_id=user_context.get("talent_id"),
+                user_name=user_context.get("user_name"),
+                email=user_context.get("email"),
+                is_manager=user_context.get("is_manager"),
+            )
+
+        try:
+            if self._coalescer is not None:
+                sql_query, sql_params = await self._coalescer.submit(context_block, natural_language_query)
+            else:
+                sql_query, sql_params = await self._generate_one(context_block, natural_language_query)
+            logger.info(f"Generated SQL: {sql_query} PARAMS: {sql_params}")
+            if use_cache:
+                self._sql_cache[cache_key] = (sql_query, sql_params)
+                if embedding is not None:
+                    self._semantic_cache.store(
+                        embedding, natural_language_query, sql_query, sql_params, user_context
+                    )
+            return sql_query, sql_params
 
         except Exception as e:
             logger.error(f"Watsonx generation error: {str(e)}")
             raise Exception(f"Failed to generate SQL query: {str(e)}")
+
+    async def generate_many(
+        self,
+        natural_language_queries: list[str],
+        user_context: dict | None = None,
+        use_cache: bool = True,
+    ) -> list:
+        """
+        Generate SQL for several questions concurrently, at most
+        SQL_GENERATE_CONCURRENCY at a time. Returns (sql, params) per
+        question in order; a question that fails yields its exception
+        instead of failing the others.
+        """
+        semaphore = asyncio.Semaphore(SQL_GENERATE_CONCURRENCY)
+
+        async def one(natural_language_query: str):
+            async with semaphore:
+                return await self.generate_sql_query(natural_language_query, user_context, use_cache)
+
+        return await asyncio.gather(
+            *(one(q) for q in natural_language_queries), return_exceptions=True
+        )
@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_router import KeywordRouter
+
+CONTEXT = {"user_id": 42, "email": "alice@ibm.com"}
+
+
+class KeywordRouterTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.router = KeywordRouter()
+
+    def params(self, query, user_context=None):
+        routed = self.router.route(query, user_context)
+        self.assertIsNotNone(routed, query)
+        return routed[1]
+
+    def assertMiss(self, query, user_context=None):
+        self.assertIsNone(self.router.route(query, user_context), query)
+
+    def test_manager_of_user(self):
+        self.assertEqual(self.params("Get manager name for user John Doe"), ["%john doe%"])
+
+    def test_name_stops_at_connecting_word(self):
+        self.assertMiss("Get manager name for user John Doe in the cloud team")
+
+    def test_name_cannot_start_with_connecting_word(self):
+        self.assertMiss("Get manager name for user who has the most reportees")
+        self.assertMiss("list all knowledge sharing content by user with the most views")
+        self.assertMiss("show expertise for user with the most certifications")
+
+    def test_knowledge_sharing_by_user(self):
+        self.assertEqual(
+            self.params("List all knowledge sharing content by user Jane Roe"), ["%jane roe%"]
+        )
+
+    def test_expertise_of_user(self):
+        self.assertEqual(
+            self.params("show expertise for user Jane Roe including certifications"), ["%jane roe%"]
+        )
+
+    def test_product_certification(self):
+        self.assertEqual(self.params("List users with API Connect certification"), ["%api connect%"])
+
+    def test_product_certification_false_positives(self):
+        self.assertMiss("List users with no certification")
+        self.assertMiss("List users with any certification")
+        self.assertMiss("List users with more than 2 certifications")
+        self.assertMiss("List users with 2 certifications")
+        self.assertMiss("List users with expired certifications")
+
+    def test_numeric_params(self):
+        self.assertEqual(self.params("Count reportees for manager id 7"), [7])
+
+    def test_top_n_inlined(self):
+        sql, params = self.router.route("Show top 5 users with the most approved assets")
+        self.assertIn("FETCH FIRST 5 ROWS ONLY", sql)
+        self.assertEqual(params, [])
+
+    def test_my_question_uses_context(self):
+        self.assertEqual(self.params("Show my reportees?", CONTEXT), [42])
+
+    def test_my_question_without_context_falls_through(self):
+        self.assertMiss("Show my reportees")
+        self.assertMiss("who is my manager", {"email": "alice@ibm.com"})
+
+    def test_unknown_question_misses(self):
+        self.assertMiss("Which products have the most certified users in 2023")
+
+    def test_hits_are_counted(self):
+        router = KeywordRouter()
+        router.route("Show my reportees", CONTEXT)
+        router.route("Which products have the most certified users")
+        self.assertEqual((router.hits, router.lookups), (1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from request_coalescer import RequestCoalescer
+
+WINDOW = 0.05
+
+
+class FakeModel:
+    """Records calls; run_batch answers None for items listed in `unanswered`."""
+
+    def __init__(self, unanswered=(), delay=0.01):
+        self.calls = []
+        self.unanswered = set(unanswered)
+        self.delay = delay
+
+    async def run_one(self, key, item):
+        self.calls.append(("one", key, item))
+        await asyncio.sleep(self.delay)
+        if item == "fail":
+            raise ValueError("model error")
+        return f"one:{item}"
+
+    async def run_batch(self, key, items):
+        self.calls.append(("batch", key, tuple(items)))
+        await asyncio.sleep(self.delay)
+        return [None if item in self.unanswered else f"batch:{item}" for item in items]
+
+
+class RequestCoalescerTest(unittest.IsolatedAsyncioTestCase):
+    def coalescer(self, model, max_batch=8):
+        return RequestCoalescer(model.run_one, model.run_batch, WINDOW, max_batch)
+
+    async def test_concurrent_items_batched(self):
+        model = FakeModel()
+        coalescer = self.coalescer(model)
+        results = await asyncio.gather(*(coalescer.submit("ctx", q) for q in ("a", "b", "c")))
+        self.assertEqual(results, ["batch:a", "batch:b", "batch:c"])
+        self.assertEqual(model.calls, [("batch", "ctx", ("a", "b", "c"))])
+
+    async def test_items_grouped_by_key(self):
+        model = FakeModel()
+        coalescer = self.coalescer(model)
+        results = await asyncio.gather(
+            coalescer.submit("ctx1", "a"), coalescer.submit("ctx2", "b"), coalescer.submit("ctx1", "c")
+        )
+        self.assertEqual(results, ["batch:a", "one:b", "batch:c"])
+        self.assertCountEqual(model.calls, [("batch", "ctx1", ("a", "c")), ("one", "ctx2", "b")])
+
+    async def test_max_batch(self):
+        model = FakeModel()
+        coalescer = self.coalescer(model, max_batch=2)
+        await asyncio.gather(*(coalescer.submit("ctx", q) for q in ("a", "b", "c", "d")))
+        self.assertEqual(
+            [call for call in model.calls if call[0] == "batch"],
+            [("batch", "ctx", ("a", "b")), ("batch", "ctx", ("c", "d"))],
+        )
+
+    async def test_lone_request_does_not_wait(self):
+        model = FakeModel(delay=0)
+        coalescer = self.coalescer(model)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self.assertEqual(await coalescer.submit("ctx", "a"), "one:a")
+        self.assertLess(loop.time() - start, WINDOW / 2)
+        self.assertEqual(model.calls, [("one", "ctx", "a")])
+
+    async def test_identical_items_share_one_call(self):
+        model = FakeModel()
+        coalescer = self.coalescer(model)
+        results = await asyncio.gather(*(coalescer.submit("ctx", "same") for _ in range(4)))
+        self.assertEqual(results, ["one:same"] * 4)
+        self.assertEqual(model.calls, [("one", "ctx", "same")])
+
+    async def test_unanswered_items_fall_back_to_run_one(self):
+        model = FakeModel(unanswered={"b"})
+        coalescer = self.coalescer(model)
+        results = await asyncio.gather(*(coalescer.submit("ctx", q) for q in ("a", "b")))
+        self.assertEqual(results, ["batch:a", "one:b"])
+        self.assertEqual(model.calls, [("batch", "ctx", ("a", "b")), ("one", "ctx", "b")])
+
+    async def test_failed_batch_falls_back_to_run_one(self):
+        model = FakeModel()
+
+        async def broken_batch(key, items):
+            raise RuntimeError("bad JSON")
+
+        coalescer = RequestCoalescer(model.run_one, broken_batch, WINDOW, 8)
+        with self.assertLogs("request_coalescer", "WARNING"):
+            results = await asyncio.gather(*(coalescer.submit("ctx", q) for q in ("a", "b")))
+        self.assertEqual(results, ["one:a", "one:b"])
+
+    async def test_run_one_error_reaches_every_waiter(self):
+        coalescer = self.coalescer(FakeModel())
+        results = await asyncio.gather(
+            coalescer.submit("ctx", "fail"), coalescer.submit("ctx", "fail"), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(coalescer._inflight, {})
+
+    async def test_cancelled_waiter_keeps_shared_result(self):
+        model = FakeModel(delay=0.02)
+        coalescer = self.coalescer(model)
+        first = asyncio.create_task(coalescer.submit("ctx", "same"))
+        second = asyncio.create_task(coalescer.submit("ctx", "same"))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "one:same")
+        self.assertTrue(first.cancelled())
+        self.assertEqual(model.calls, [("one", "ctx", "same")])
+
+    async def test_resolved_items_are_not_reused(self):
+        model = FakeModel(delay=0)
+        coalescer = self.coalescer(model)
+        await coalescer.submit("ctx", "a")
+        await coalescer.submit("ctx", "a")
+        self.assertEqual(len(model.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import SemanticCache, USER_ID_PARAM
+
+ALICE = {"user_id": 12, "email": "alice@ibm.com", "talent_id": "T100", "is_manager": True}
+BOB = {"user_id": 9, "email": "bob@ibm.com", "talent_id": "T200", "is_manager": True}
+
+
+class SemanticCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticCache(size=4, threshold=0.9, ttl=3600)
+        self.vector = SemanticCache.normalize([1.0, 0.0, 0.0])
+
+    def store(self, query, sql, params, user_context):
+        self.cache.store(self.vector, query, sql, params, user_context)
+
+    def lookup(self, query, user_context):
+        return self.cache.lookup(self.vector, query, user_context)
+
+    def test_empty_cache_misses(self):
+        self.assertIsNone(self.lookup("show my reportees", ALICE))
+
+    def test_paraphrase_hits(self):
+        self.store("List active users", "SELECT * FROM users WHERE is_active = ?", [True], None)
+        self.assertEqual(
+            self.lookup("show active users", None),
+            ("SELECT * FROM users WHERE is_active = ?", [True]),
+        )
+
+    def test_dissimilar_vector_misses(self):
+        self.store("List active users", "SELECT * FROM users", [], None)
+        other = SemanticCache.normalize([0.0, 1.0, 0.0])
+        self.assertIsNone(self.cache.lookup(other, "list active users", None))
+
+    def test_user_id_filled_in_per_user(self):
+        sql = "SELECT * FROM users WHERE manager_id = ?"
+        self.store("show my reportees", sql, [12], ALICE)
+        self.assertEqual(self.lookup("show my reportees", BOB), (sql, [9]))
+
+    def test_user_id_placeholder_needs_context(self):
+        self.store("show my reportees", "SELECT * FROM users WHERE manager_id = ?", [12], ALICE)
+        self.assertIsNone(self.lookup("show my reportees", None))
+
+    def test_bool_param_not_taken_for_user_id(self):
+        sql = "SELECT * FROM users WHERE manager_id = ? AND is_active = ?"
+        one = {"user_id": 1}
+        self.store("show my active reportees", sql, [1, True], one)
+        self.assertEqual(self.lookup("show my active reportees", {"user_id": 5}), (sql, [5, True]))
+
+    def test_inlined_user_id_not_stored(self):
+        self.store("show my reportees", "SELECT * FROM users WHERE manager_id = 12", [], ALICE)
+        self.assertIsNone(self.lookup("show my reportees", BOB))
+
+    def test_inlined_email_not_stored(self):
+        sql = "SELECT u.* FROM users u JOIN users m ON u.manager_id = m.user_id WHERE m.email = 'alice@ibm.com'"
+        self.store("show my reportees", sql, [], ALICE)
+        self.assertIsNone(self.lookup("show my reportees", BOB))
+
+    def test_inlined_talent_id_not_stored(self):
+        sql = "SELECT * FROM users WHERE manager_talent_id = 'T100'"
+        self.store("show my reportees", sql, [], ALICE)
+        self.assertIsNone(self.lookup("show my reportees", BOB))
+
+    def test_value_typed_in_question_is_shared(self):
+        sql = "SELECT * FROM users WHERE manager_id = 12"
+        self.store("show reportees of user 12", sql, [], ALICE)
+        self.assertEqual(self.lookup("show reportees of user 12", BOB), (sql, []))
+
+    def test_numbers_must_match(self):
+        self.store("show user 250", "SELECT * FROM users WHERE user_id = ?", [250], None)
+        self.assertIsNone(self.lookup("show user 251", None))
+
+    def test_string_params_must_appear_in_question(self):
+        sql = "SELECT * FROM users WHERE email = ?"
+        self.store("find alice@ibm.com", sql, ["alice@ibm.com"], None)
+        self.assertIsNone(self.lookup("find bob@ibm.com", None))
+        self.assertEqual(self.lookup("Find alice@ibm.com", None), (sql, ["alice@ibm.com"]))
+
+    def test_expired_entry_misses(self):
+        self.cache.ttl = -1
+        self.store("List active users", "SELECT * FROM users", [], None)
+        self.assertIsNone(self.lookup("list active users", None))
+
+    def test_matches_placeholder(self):
+        entry = ("SELECT 1", frozenset(), [USER_ID_PARAM, "%cloud%"], 0.0)
+        self.assertTrue(SemanticCache._matches(entry, "my cloud skills", 3))
+        self.assertFalse(SemanticCache._matches(entry, "my cloud skills", None))
+        self.assertFalse(SemanticCache._matches(entry, "my java skills", 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import gzip
+import json
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sql_validator import InvalidSQLError, SQLValidator, parse_table_schemas, sqlglot
+
+with open(os.path.join(ROOT, "prompts", "schema.txt.gz"), "rb") as f:
+    SCHEMA = parse_table_schemas(gzip.decompress(f.read()).decode("utf-8"))
+
+
+class ParseTableSchemasTest(unittest.TestCase):
+    def test_parse(self):
+        schema = parse_table_schemas("TABLE: Users\n- user_id\n- Email\n\nTABLE: products\n- product_id\n")
+        self.assertEqual(schema, {"users": {"user_id", "email"}, "products": {"product_id"}})
+
+    def test_prompt_schema(self):
+        self.assertIn("user_id", SCHEMA["users"])
+        self.assertIn("approval_status", SCHEMA["user_product_assets"])
+
+
+@unittest.skipIf(sqlglot is None, "sqlglot is not installed")
+class SQLValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.validator = SQLValidator(SCHEMA)
+
+    def assertInvalid(self, sql, message):
+        with self.assertRaises(InvalidSQLError) as raised:
+            self.validator.validate(sql)
+        self.assertEqual(str(raised.exception), message)
+        self.assertEqual(raised.exception.sql_query, sql)
+
+    def test_router_templates_pass(self):
+        with open(os.path.join(ROOT, "templates.json"), encoding="utf-8") as f:
+            templates = json.load(f)
+        for template in templates:
+            sql = template["sql"]
+            if "inline" in template:
+                sql = sql.format(**{name: 5 for name in template["inline"]})
+            with self.subTest(template["name"]):
+                self.validator.validate(sql)
+
+    def test_unknown_table(self):
+        self.assertInvalid("SELECT u.user_id FROM employees u", "Unknown table: employees")
+
+    def test_unknown_qualified_column(self):
+        self.assertInvalid("SELECT u.salary FROM users u", "Unknown column: u.salary")
+
+    def test_unknown_column(self):
+        self.assertInvalid("SELECT salary FROM users", "Unknown column: salary")
+
+    def test_unknown_alias(self):
+        self.assertInvalid("SELECT x.user_id FROM users u", "Unknown table alias: x")
+
+    def test_cte_columns_accepted(self):
+        self.validator.validate(
+            "WITH counts AS (SELECT manager_user_id, COUNT(*) AS n FROM users GROUP BY manager_user_id) "
+            "SELECT c.manager_user_id, c.n FROM counts c WHERE c.n > ?"
+        )
+
+    def test_derived_table_accepted(self):
+        self.validator.validate(
+            "SELECT d.user_id, d.total FROM "
+            "(SELECT upa.user_id, COUNT(*) AS total FROM user_product_assets upa GROUP BY upa.user_id) d "
+            "ORDER BY d.total DESC"
+        )
+
+    def test_output_alias_accepted(self):
+        self.validator.validate(
+            "SELECT u.user_id, COUNT(upe.expertise_id) AS skill_count FROM users u "
+            "JOIN user_product_expertise upe ON u.user_id = upe.user_id "
+            "GROUP BY u.user_id ORDER BY skill_count DESC"
+        )
+
+    def test_db2_date_arithmetic_not_rejected(self):
+        self.validator.validate(
+            "SELECT n.notification_id FROM notifications n WHERE n.created_at >= CURRENT DATE - 30 DAYS"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
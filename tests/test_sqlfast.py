@@ -0,0 +1,67 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _sqlfast import clean_sql_query
+
+
+class CleanSQLQueryTest(unittest.TestCase):
+    def test_plain_select(self):
+        self.assertEqual(
+            clean_sql_query("SELECT a\nFROM t\nWHERE b = ?;\nPARAMS: [1]"),
+            "SELECT a FROM t WHERE b = ?",
+        )
+
+    def test_sql_label(self):
+        self.assertEqual(clean_sql_query("SQL: SELECT a FROM t;"), "SELECT a FROM t")
+
+    def test_fenced(self):
+        self.assertEqual(
+            clean_sql_query("```sql\nSELECT *\nFROM users WHERE id = ?;\nPARAMS: [5]\n```\nThis returns all"),
+            "SELECT * FROM users WHERE id = ?",
+        )
+
+    def test_preamble_mentioning_select(self):
+        generated = (
+            "Here is the query to select all active users:\n"
+            "SELECT * FROM users WHERE is_active = TRUE;\n"
+            "PARAMS: []"
+        )
+        self.assertEqual(clean_sql_query(generated), "SELECT * FROM users WHERE is_active = TRUE")
+
+    def test_prose_lines_removed(self):
+        generated = (
+            "```sql\nHere is the query:\nSELECT a FROM t\n"
+            "Note: filters active rows\nWHERE b = ?;\nPARAMS: [1]\n```"
+        )
+        self.assertEqual(clean_sql_query(generated), "SELECT a FROM t WHERE b = ?")
+
+    def test_unfenced_note_line_keeps_rest(self):
+        generated = (
+            "SELECT u.user_id FROM users u\nNote: only active users\n"
+            "WHERE u.is_active = TRUE;\nPARAMS: []"
+        )
+        self.assertEqual(
+            clean_sql_query(generated),
+            "SELECT u.user_id FROM users u WHERE u.is_active = TRUE",
+        )
+
+    def test_unfenced_blank_line_keeps_rest(self):
+        generated = "SELECT u.user_id FROM users u\n\nWHERE u.is_active = TRUE\nPARAMS: []"
+        self.assertEqual(
+            clean_sql_query(generated),
+            "SELECT u.user_id FROM users u WHERE u.is_active = TRUE",
+        )
+
+    def test_word_boundary_keeps_sql(self):
+        self.assertEqual(clean_sql_query("SELECT a\nFROM themes t;"), "SELECT a FROM themes t")
+
+    def test_no_select(self):
+        with self.assertRaises(ValueError):
+            clean_sql_query("I cannot answer that.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+IBM Cloud IAM bearer tokens for Watsonx.ai calls.
+
+One TokenManager per worker exchanges the API key for an access token and
+hands the same token to every outbound request, refreshing it shortly
+before it expires instead of re-authenticating per call.
+"""
+import asyncio
+import logging
+import time
+
+import httpx
+import orjson
+
+logger = logging.getLogger(__name__)
+
+IAM_TOKEN_URL = "https://iam.cloud.ibm.com/identity/token"
+# Refresh the token this many seconds before it expires
+IAM_REFRESH_MARGIN = 300
+
+
+class TokenManager:
+    def __init__(self, api_key: str, client: httpx.AsyncClient):
+        self.api_key = api_key
+        self._client = client
+        self._token = None
+        self._refresh_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_token(self) -> str:
+        """Return the current access token, refreshing it when it is about to expire."""
+        # Fast path: no lock while the token is fresh
+        if self._token is not None and time.monotonic() < self._refresh_at:
+            return self._token
+        async with self._lock:
+            # Another request may have refreshed it while we waited
+            if self._token is None or time.monotonic() >= self._refresh_at:
+                await self._refresh()
+            return self._token
+
+    async def invalidate(self, token: str) -> str:
+        """
+        Drop a token the server rejected and return a fresh one. Requests
+        that fail with the same stale token share a single refresh.
+        """
+        async with self._lock:
+            if token == self._token:
+                await self._refresh()
+            return self._token
+
+    async def _refresh(self):
+        response = await self._client.post(
+            IAM_TOKEN_URL,
+            data={
+                "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
+                "apikey": self.api_key,
+            },
+            headers={"Accept": "application/json"},
+            timeout=30,
+        )
+        response.raise_for_status()
+        token = orjson.loads(response.content)
+        self._token = token["access_token"]
+        self._refresh_at = time.monotonic() + float(token["expires_in"]) - IAM_REFRESH_MARGIN
+        logger.info(f"IAM token refreshed (expires in {token['expires_in']}s)")